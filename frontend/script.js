@@ -37,40 +37,85 @@ const PROMPT_BASE = `
 
 let lastFiles = [];
 
+// output="diff": the file carries a unified diff instead of its content
+function fileText(f) {
+  return f.diff != null ? f.diff : (f.content || "");
+}
+
+function fileName(f) {
+  const name = f.path || "arquivo.txt";
+  return f.diff != null ? `${name}.patch` : name;
+}
+
+function fileNode(f) {
+  const details = document.createElement("details");
+  const sum = document.createElement("summary");
+  sum.textContent = f.path || "(sem nome)";
+  if (f.valid === false && f.syntax_error) {
+    const e = f.syntax_error;
+    sum.textContent += ` — erro de sintaxe (linha ${e.line}, col ${e.col}): ${e.message}`;
+  }
+
+  const actions = document.createElement("div");
+  actions.className = "file-actions";
+  const bCopy = document.createElement("button");
+  bCopy.className = "ghost";
+  bCopy.textContent = "copiar";
+  bCopy.addEventListener("click", (e)=>{ e.preventDefault(); copyText(fileText(f)); });
+
+  const bDl = document.createElement("button");
+  bDl.className = "ghost";
+  bDl.textContent = "baixar";
+  bDl.addEventListener("click", (e)=>{ e.preventDefault(); download(fileName(f), fileText(f)); });
+
+  actions.appendChild(bCopy);
+  actions.appendChild(bDl);
+
+  const pre = document.createElement("pre");
+  const code = document.createElement("code");
+  code.textContent = fileText(f);
+  pre.appendChild(code);
+
+  details.appendChild(sum);
+  details.appendChild(actions);
+  details.appendChild(pre);
+  return details;
+}
+
 function renderFiles(files) {
   lastFiles = files || [];
   const root = $("#files");
   root.innerHTML = "";
-  (lastFiles).forEach((f) => {
-    const details = document.createElement("details");
-    const sum = document.createElement("summary");
-    sum.textContent = f.path || "(sem nome)";
-
-    const actions = document.createElement("div");
-    actions.className = "file-actions";
-    const bCopy = document.createElement("button");
-    bCopy.className = "ghost";
-    bCopy.textContent = "copiar";
-    bCopy.addEventListener("click", (e)=>{ e.preventDefault(); copyText(f.content||""); });
-
-    const bDl = document.createElement("button");
-    bDl.className = "ghost";
-    bDl.textContent = "baixar";
-    bDl.addEventListener("click", (e)=>{ e.preventDefault(); download(f.path||"arquivo.txt", f.content||""); });
-
-    actions.appendChild(bCopy);
-    actions.appendChild(bDl);
-
-    const pre = document.createElement("pre");
-    const code = document.createElement("code");
-    code.textContent = f.content || "";
-    pre.appendChild(code);
-
-    details.appendChild(sum);
-    details.appendChild(actions);
-    details.appendChild(pre);
-    root.appendChild(details);
-  });
+  (lastFiles).forEach((f) => root.appendChild(fileNode(f)));
+}
+
+// incremental render while /compare/stream is running
+function appendFile(f) {
+  lastFiles.push(f);
+  $("#files").appendChild(fileNode(f));
+}
+
+// minimal SSE reader over fetch (EventSource cannot POST a body)
+async function readSSE(resp, onEvent) {
+  const reader = resp.body.getReader();
+  const dec = new TextDecoder();
+  let buf = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += dec.decode(value, { stream: true });
+    let i;
+    while ((i = buf.indexOf("\n\n")) >= 0) {
+      const block = buf.slice(0, i);
+      buf = buf.slice(i + 2);
+      let event = "message", data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (data) onEvent(event, JSON.parse(data));
+    }
+  }
 }
 
 function offlineBanner(show) {
@@ -95,6 +140,7 @@ async function runCompare() {
 
   const allow_placeholders = $("#allow-placeholders").checked;
   const debug_echo_raw = $("#debug-echo-raw").checked;
+  const output = $("#output-diff").checked ? "diff" : "full";
 
   const debug_no_llm = !(llm_api_key && model && llm_api_url);
 
@@ -105,8 +151,9 @@ async function runCompare() {
   $("#files").innerHTML = "";
   setText($("#raw code"), "");
 
+  lastFiles = [];
   try {
-    const r = await fetch(`${API_BASE}/compare`, {
+    const r = await fetch(`${API_BASE}/compare/stream`, {
       method: "POST",
       headers: { "content-type": "application/json" },
       body: JSON.stringify({
@@ -125,11 +172,12 @@ async function runCompare() {
         prompt_base: PROMPT_BASE,
         allow_placeholders,
         debug_echo_raw,
+        output,
       }),
     });
 
-    const text = await r.text();
     if (!r.ok) {
+      const text = await r.text();
       let msg = text;
       try {
         const j = JSON.parse(text);
@@ -138,7 +186,26 @@ async function runCompare() {
       throw new Error(msg);
     }
 
-    const j = JSON.parse(text);
+    let result = null;
+    let failure = null;
+    await readSSE(r, (event, data) => {
+      if (event === "progress") {
+        $("#status").textContent = `lendo repositório: ${data.files} arquivos (~${data.bytes} bytes)`;
+      } else if (event === "stage") {
+        const next = { github_client: "lendo repositório...", crawl: "montando prompt...", pack: "chamando LLM...", llm: "validando saída..." };
+        if (next[data.stage]) $("#status").textContent = next[data.stage];
+      } else if (event === "file") {
+        appendFile(data);
+      } else if (event === "result") {
+        result = data;
+      } else if (event === "error") {
+        failure = data.detail || "erro";
+      }
+    });
+    if (failure) throw new Error(failure);
+    if (!result) throw new Error("conexão encerrada antes do resultado");
+
+    const j = result;
     setText($("#report code"), j.report || "");
     bullets($("#summary"), j.summary || []);
     renderFiles(j.updated_files || []);
@@ -158,7 +225,7 @@ async function runCompare() {
 document.addEventListener("DOMContentLoaded", () => {
   $("#run").addEventListener("click", runCompare);
   $("#download-all").addEventListener("click", ()=>{
-    for (const f of lastFiles) download(f.path||"arquivo.txt", f.content||"");
+    for (const f of lastFiles) download(fileName(f), fileText(f));
   });
 
   // quick deep-linking
@@ -173,5 +240,6 @@ document.addEventListener("DOMContentLoaded", () => {
   if (q.get("paths")) $("#paths").value = q.get("paths");
   if (q.get("allow")) $("#allow-placeholders").checked = q.get("allow") === "1";
   if (q.get("raw")) $("#debug-echo-raw").checked = q.get("raw") === "1";
+  if (q.get("diff")) $("#output-diff").checked = q.get("diff") === "1";
   if (q.get("autorun") === "1") runCompare();
 });
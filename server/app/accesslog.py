@@ -0,0 +1,176 @@
+# Structured access log as an ASGI middleware.
+# Request bodies are never buffered for logging: the size is counted as chunks flow through
+# `receive`, and only a sampled fraction of requests keeps a bounded prefix, which is redacted
+# before it is written. Records go through a bounded queue to a listener thread that formats
+# them as JSON lines, so the event loop only pays for a put_nowait (and drops when saturated).
+import sys, json, time, queue, random, re, logging, logging.handlers
+from typing import Any, Dict, Iterable, List
+
+REDACTED = "***"
+# name segments (llm_api_key, github_private_key_pem_b64, github_pat, ...) whose values never
+# reach the log; "token" only as the last segment, so token_budget/shard_tokens stay visible
+SECRET_SEGMENTS = frozenset({"key", "apikey", "secret", "password", "pem", "pat", "authorization", "credential", "credentials"})
+
+def is_secret(name: str, extra: Iterable[str] = ()) -> bool:
+    n = name.lower()
+    parts = re.split(r"[_\-.]", n)
+    return n in extra or parts[-1] == "token" or any(p in SECRET_SEGMENTS for p in parts)
+
+def redact(value: Any, extra: Iterable[str] = ()) -> Any:
+    if isinstance(value, dict):
+        return {k: (REDACTED if is_secret(str(k), extra) else redact(v, extra)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v, extra) for v in value]
+    return value
+
+# "some_key": "value   (value possibly cut by the sample limit)
+_JSON_STR_FIELD = re.compile(r'"([^"\\]{1,64})"\s*:\s*"(?:[^"\\]|\\.)*"?')
+
+def redact_body(raw: bytes, extra: Iterable[str] = ()) -> Any:
+    # parsed and redacted per field when the sample holds the whole JSON body; a truncated
+    # or non-JSON prefix falls back to blanking every string value under a secret-looking name
+    text = raw.decode("utf-8", errors="replace")
+    try:
+        return redact(json.loads(text), extra)
+    except ValueError:
+        pass
+    return _JSON_STR_FIELD.sub(
+        lambda mt: f'"{mt.group(1)}": "{REDACTED}"' if is_secret(mt.group(1), extra) else mt.group(0), text
+    )
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        out.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+class _StderrHandler(logging.StreamHandler):
+    # resolves sys.stderr at write time (it may be swapped after import, e.g. by test capture)
+    @property
+    def stream(self):
+        return sys.stderr
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, q: "queue.Queue"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # formatting happens on the listener thread, not on the caller's
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class AccessLog:
+    def __init__(
+        self,
+        name: str = "legacyexe.access",
+        sample: float = 0.0,
+        max_body: int = 2048,
+        queue_size: int = 10_000,
+        redact_fields: Iterable[str] = (),
+        stream=None,
+    ):
+        self.sample = sample
+        self.max_body = max_body
+        self.redact_fields = frozenset(f.strip().lower() for f in redact_fields if f.strip())
+        self.logger = logging.getLogger(name)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        for h in list(self.logger.handlers):
+            self.logger.removeHandler(h)
+        self.handler = _DroppingQueueHandler(queue.Queue(queue_size))
+        self.logger.addHandler(self.handler)
+        out = logging.StreamHandler(stream) if stream is not None else _StderrHandler()
+        out.setFormatter(JsonFormatter())
+        self._listener = logging.handlers.QueueListener(self.handler.queue, out)
+        self._running = False
+
+    @classmethod
+    def from_env(cls, env) -> "AccessLog":
+        return cls(
+            sample=float(env.get("LOG_BODY_SAMPLE", "0") or 0),
+            max_body=int(env.get("LOG_BODY_MAX_BYTES", "2048") or 0),
+            queue_size=int(env.get("LOG_QUEUE_SIZE", "10000") or 10_000),
+            redact_fields=(env.get("LOG_REDACT_FIELDS") or "").split(","),
+        )
+
+    def start(self) -> None:
+        if not self._running:
+            self._listener.start()
+            self._running = True
+
+    def stop(self) -> None:
+        # flushes what is queued
+        if self._running:
+            self._listener.stop()
+            self._running = False
+
+    def sampled(self) -> bool:
+        return self.sample > 0 and self.max_body > 0 and random.random() < self.sample
+
+    def emit(self, fields: Dict[str, Any]) -> None:
+        self.logger.info("request", extra={"fields": fields})
+
+class AccessLogMiddleware:
+    def __init__(self, app, access: AccessLog):
+        self.app = app
+        self.access = access
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        access = self.access
+        t0 = time.perf_counter()
+        keep = access.max_body if access.sampled() else 0
+        sample: List[bytes] = []
+        state = {"req": 0, "resp": 0, "status": None, "kept": 0}
+
+        async def _receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                state["req"] += len(chunk)
+                if state["kept"] < keep and chunk:
+                    part = chunk[: keep - state["kept"]]
+                    sample.append(part)
+                    state["kept"] += len(part)
+            return message
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["resp"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, _receive, _send)
+        finally:
+            fields: Dict[str, Any] = {
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "status": state["status"] or 500,
+                "req_bytes": state["req"],
+                "resp_bytes": state["resp"],
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 3),
+            }
+            if sample:
+                fields["body"] = redact_body(b"".join(sample), access.redact_fields)
+                fields["body_truncated"] = state["kept"] < state["req"]
+            access.emit(fields)
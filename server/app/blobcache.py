@@ -0,0 +1,142 @@
+# Content-addressed on-disk cache of git blobs.
+# Blobs are immutable by SHA, so entries never need invalidation; the directory is
+# only trimmed (least recently used first) when it grows past max_bytes.
+# Several uvicorn workers may share one directory: writes go through a temp file +
+# os.replace, and eviction runs under an advisory file lock when the OS supports it.
+import os, re, hashlib, tempfile, threading
+from typing import Optional, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: eviction is only serialized inside this process
+    fcntl = None
+
+_SHA_RE = re.compile(r"^(?:[0-9a-f]{40}|[0-9a-f]{64})$")
+
+def git_blob_sha(data: bytes, algo: str = "sha1") -> str:
+    h = hashlib.new(algo)
+    h.update(b"blob %d\0" % len(data))
+    h.update(data)
+    return h.hexdigest()
+
+class BlobCache:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._written = 0
+        os.makedirs(root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["BlobCache"]:
+        root = os.getenv("BLOB_CACHE_DIR", os.path.join(tempfile.gettempdir(), "legacyexe-blobs"))
+        if not root.strip() or root.strip().lower() == "off":
+            return None
+        max_mb = int(os.getenv("BLOB_CACHE_MAX_MB", "512"))
+        try:
+            return cls(root, max_mb * 1024 * 1024)
+        except OSError:
+            return None
+
+    def _path(self, sha: str) -> str:
+        return os.path.join(self.root, sha[:2], sha[2:])
+
+    def _count(self, attr: str, n: int = 1) -> None:
+        with self._lock:
+            setattr(self, attr, getattr(self, attr) + n)
+
+    def get(self, sha: Optional[str]) -> Optional[bytes]:
+        sha = (sha or "").lower()
+        if not _SHA_RE.match(sha):
+            return None
+        p = self._path(sha)
+        try:
+            with open(p, "rb") as f:
+                data = f.read()
+            os.utime(p)  # mtime doubles as the LRU clock
+        except OSError:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return data
+
+    def contains(self, sha: Optional[str]) -> bool:
+        sha = (sha or "").lower()
+        return bool(_SHA_RE.match(sha)) and os.path.exists(self._path(sha))
+
+    def put(self, sha: Optional[str], data: bytes) -> bool:
+        sha = (sha or "").lower()
+        if not _SHA_RE.match(sha) or len(data) > self.max_bytes:
+            return False
+        # never store bytes under a SHA they do not hash to
+        if git_blob_sha(data, "sha1" if len(sha) == 40 else "sha256") != sha:
+            return False
+        p = self._path(sha)
+        try:
+            os.makedirs(os.path.dirname(p), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(p), prefix=".tmp-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, p)
+        except OSError:
+            return False
+        with self._lock:
+            self.stores += 1
+            self._written += len(data)
+            sweep = self._written >= max(1, self.max_bytes // 10)
+            if sweep:
+                self._written = 0
+        if sweep:
+            self.evict()
+        return True
+
+    def evict(self) -> int:
+        lock_f = None
+        try:
+            lock_f = open(os.path.join(self.root, ".lock"), "a")
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0  # another worker is already sweeping
+            files = []
+            total = 0
+            for shard in os.scandir(self.root):
+                if not shard.is_dir():
+                    continue
+                for e in os.scandir(shard.path):
+                    if e.name.startswith(".tmp-"):
+                        continue
+                    try:
+                        st = e.stat()
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, e.path))
+                    total += st.st_size
+            removed = 0
+            target = int(self.max_bytes * 0.9)
+            if total > self.max_bytes:
+                for _, size, path in sorted(files):
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+                    removed += 1
+            self._count("evictions", removed)
+            return removed
+        except OSError:
+            return 0
+        finally:
+            if lock_f is not None:
+                lock_f.close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "stores": self.stores, "evictions": self.evictions}
@@ -0,0 +1,88 @@
+# Response compression picked from the client's accepted encodings: zstd when the zstandard
+# package is installed and the client accepts it, gzip otherwise. Only complete bodies are
+# compressed; streamed responses (SSE) pass through untouched so events are not held back.
+import gzip
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional: gzip only
+    zstandard = None
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        out[name.strip().lower()] = q
+    return out
+
+def choose_encoding(header: str, available: Tuple[str, ...]) -> Optional[str]:
+    # best q among what we can produce; ties follow our own preference order
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for enc in available:
+        q = accepted.get(enc, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, zstd_level: int = 3):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.zstd_level = zstd_level
+        self.available = (("zstd",) if zstandard else ()) + ("gzip",)
+
+    def _compress(self, enc: str, body: bytes) -> bytes:
+        if enc == "zstd":
+            return zstandard.ZstdCompressor(level=self.zstd_level).compress(body)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        header = ""
+        for k, v in scope.get("headers") or []:
+            if k == b"accept-encoding":
+                header = v.decode("latin-1")
+        enc = choose_encoding(header, self.available) if header else None
+        if enc is None:
+            return await self.app(scope, receive, send)
+
+        start: Optional[dict] = None
+        passthrough = False
+
+        async def _send(message):
+            nonlocal start, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                return await send(message)
+            headers: List[Tuple[bytes, bytes]] = list(start.get("headers") or [])
+            names = {k.lower() for k, _ in headers}
+            ctype = next((v for k, v in headers if k.lower() == b"content-type"), b"")
+            body = message.get("body", b"")
+            if (message.get("more_body") or b"content-encoding" in names or len(body) < self.minimum_size
+                    or ctype.startswith(b"text/event-stream")):
+                passthrough = True
+                await send(start)
+                return await send(message)
+            data = self._compress(enc, body)
+            headers = [(k, v) for k, v in headers if k.lower() != b"content-length"]
+            headers += [(b"content-encoding", enc.encode()), (b"content-length", str(len(data)).encode()),
+                        (b"vary", b"Accept-Encoding")]
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": data})
+
+        await self.app(scope, receive, _send)
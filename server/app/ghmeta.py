@@ -0,0 +1,96 @@
+# Conditional GitHub API requests and commit-SHA keyed metadata.
+# Mutable resources (repository metadata, ref -> commit SHA) are revalidated with
+# If-None-Match: a 304 carries no body and does not count against the rate limit.
+# Anything addressed by a commit SHA never changes, so it is cached without revalidation,
+# but still per credential: knowing a SHA must not stand in for access to the repository.
+import json, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+SHA_MEDIA_TYPE = "application/vnd.github.sha"
+
+def auth_key(requester: Any) -> str:
+    # ETags are per representation *and* per credential: never answer one token with
+    # what another token was allowed to see
+    token = getattr(getattr(requester, "auth", None), "token", None) or ""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _header(headers: Dict[str, Any], name: str) -> Optional[str]:
+    for k, v in (headers or {}).items():
+        if k.lower() == name:
+            return v
+    return None
+
+class ETagCache:
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.not_modified = 0
+        self.fetched = 0
+        self._data: "OrderedDict[Tuple[str, str, Tuple], Tuple[str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, requester: Any, url: str, headers: Optional[Dict[str, str]] = None) -> str:
+        # GET url through a PyGithub Requester; returns the body (revalidated when cached)
+        key = (auth_key(requester), url, tuple(sorted((headers or {}).items())))
+        with self._lock:
+            item = self._data.get(key)
+        hdrs = dict(headers or {})
+        if item is not None:
+            hdrs["If-None-Match"] = item[0]
+        status, resp_headers, body = requester.requestJson("GET", url, headers=hdrs)
+        if status == 304 and item is not None:
+            with self._lock:
+                self.not_modified += 1
+                if key in self._data:
+                    self._data.move_to_end(key)
+            return item[1]
+        if status >= 400:
+            try:
+                data = json.loads(body) if body else None
+            except ValueError:
+                data = {"message": body}
+            raise requester.createException(status, resp_headers, data)
+        etag = _header(resp_headers, "etag")
+        with self._lock:
+            self.fetched += 1
+            if etag:
+                self._data[key] = (etag, body)
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+        return body
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._data), "not_modified": self.not_modified, "fetched": self.fetched}
+
+class ShaCache:
+    # plain LRU for immutable, SHA-addressed values (recursive trees, directory listings)
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._data), "hits": self.hits, "misses": self.misses}
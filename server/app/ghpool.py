@@ -0,0 +1,91 @@
+# Process-wide pool of authenticated PyGithub clients.
+# Clients are keyed by a fingerprint of their credentials and reused across requests, so
+# their HTTP sessions (and keep-alive connections) are reused too. GitHub App installation
+# tokens are cached until shortly before they expire and refreshed by a single thread
+# while concurrent requests for the same installation wait for that one refresh.
+import hashlib, threading, time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from github import Auth, Github, GithubIntegration
+
+TOKEN_REFRESH_MARGIN = 300  # seconds before expiry when a token stops being handed out
+
+def _fingerprint(*parts: str) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update((p or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+def mint_installation_token(app_id: str, installation_id: str, private_key_pem: str) -> Tuple[str, float]:
+    integ = GithubIntegration(auth=Auth.AppAuth(int(app_id), private_key_pem))
+    auth = integ.get_access_token(int(installation_id))
+    return auth.token, auth.expires_at.timestamp()
+
+class GithubPool:
+    def __init__(self, max_clients: int = 256, client_kwargs: Optional[Dict[str, Any]] = None,
+                 mint: Callable[[str, str, str], Tuple[str, float]] = mint_installation_token):
+        self.max_clients = max_clients
+        self.client_kwargs = client_kwargs or {}
+        self.mint = mint
+        self.mints = 0
+        self._clients: "OrderedDict[str, Tuple[Github, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights: Dict[str, threading.Lock] = {}
+
+    def _new(self, token: Optional[str]) -> Github:
+        return Github(auth=Auth.Token(token) if token else None, **self.client_kwargs)
+
+    def _cached(self, key: str) -> Optional[Github]:
+        with self._lock:
+            item = self._clients.get(key)
+            if item is None or item[1] - TOKEN_REFRESH_MARGIN <= time.time():
+                return None
+            self._clients.move_to_end(key)
+            return item[0]
+
+    def _store(self, key: str, client: Github, expires_at: float) -> None:
+        with self._lock:
+            self._clients[key] = (client, expires_at)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+    def _flight(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._flights.setdefault(key, threading.Lock())
+
+    def token(self, token: Optional[str]) -> Github:
+        key = _fingerprint("token", token or "")
+        client = self._cached(key)
+        if client is None:
+            client = self._new(token)
+            self._store(key, client, float("inf"))
+        return client
+
+    def app(self, app_id: str, installation_id: str, private_key_pem: str) -> Github:
+        key = _fingerprint("app", str(app_id), str(installation_id), private_key_pem)
+        client = self._cached(key)
+        if client is not None:
+            return client
+        flight = self._flight(key)
+        try:
+            with flight:
+                client = self._cached(key)  # another thread may have refreshed it meanwhile
+                if client is None:
+                    token, expires_at = self.mint(app_id, installation_id, private_key_pem)
+                    with self._lock:
+                        self.mints += 1
+                    client = self._new(token)
+                    self._store(key, client, expires_at)
+                return client
+        finally:
+            # waiters already hold a reference; later callers find the cached client
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"clients": len(self._clients), "mints": self.mints}
@@ -0,0 +1,285 @@
+# Background compare jobs persisted in SQLite.
+# Every uvicorn worker runs a JobRunner with a fixed number of slots; workers share the
+# database, claim queued jobs atomically and heartbeat so jobs of a dead worker do not
+# stay "running" forever. Credentials sent with a request are never written to disk:
+# such jobs are pinned to the worker that accepted them and keep the secrets in memory.
+import os, json, time, uuid, sqlite3, asyncio, threading, logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+log = logging.getLogger("uvicorn.error")
+
+SECRET_FIELDS = ("llm_api_key", "groq_api_key", "github_pat", "github_private_key_pem_b64")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    request TEXT NOT NULL,
+    owner TEXT,
+    pinned INTEGER NOT NULL DEFAULT 0,
+    cancel INTEGER NOT NULL DEFAULT 0,
+    stages TEXT NOT NULL DEFAULT '{}',
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    error_status INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created);
+CREATE TABLE IF NOT EXISTS workers (id TEXT PRIMARY KEY, seen REAL NOT NULL);
+"""
+
+class JobStore:
+    def __init__(self, path: str):
+        self.path = path
+        d = os.path.dirname(os.path.abspath(path))
+        os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+
+    def _exec(self, sql: str, args: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, args)
+
+    def create(self, request: Dict[str, Any], owner: Optional[str]) -> str:
+        job_id = uuid.uuid4().hex
+        public = {k: v for k, v in request.items() if k not in SECRET_FIELDS}
+        self._exec(
+            "INSERT INTO jobs (id, status, created, request, owner, pinned) VALUES (?, 'queued', ?, ?, ?, ?)",
+            (job_id, time.time(), json.dumps(public), owner, 1 if owner else 0),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._exec("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        if status:
+            rows = self._exec("SELECT * FROM jobs WHERE status = ? ORDER BY created DESC LIMIT ?", (status, limit))
+        else:
+            rows = self._exec("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+        return [self._row(r) for r in rows.fetchall()]
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        d = dict(row)
+        d["request"] = json.loads(d["request"])
+        d["stages"] = json.loads(d["stages"] or "{}")
+        d["progress"] = json.loads(d["progress"]) if d["progress"] else None
+        d["result"] = json.loads(d["result"]) if d["result"] else None
+        d["cancel"] = bool(d["cancel"])
+        d["pinned"] = bool(d["pinned"])
+        return d
+
+    def claim(self, owner: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' AND cancel = 0 AND (owner IS NULL OR owner = ?) ORDER BY created LIMIT 1",
+                    (owner,),
+                ).fetchone()
+                if row is None:
+                    self._db.execute("COMMIT")
+                    return None
+                self._db.execute(
+                    "UPDATE jobs SET status = 'running', owner = ?, started = ? WHERE id = ?",
+                    (owner, time.time(), row["id"]),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.get(row["id"])
+
+    def record_stage(self, job_id: str, stage: str, seconds: float) -> None:
+        self._exec(
+            "UPDATE jobs SET stages = json_set(stages, '$.' || ?, ?) WHERE id = ?",
+            (stage, seconds, job_id),
+        )
+
+    def record_progress(self, job_id: str, progress: Dict[str, Any]) -> None:
+        self._exec("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+    def finish(self, job_id: str, status: str, *, result: Any = None, error: Optional[str] = None, error_status: Optional[int] = None) -> None:
+        self._exec(
+            "UPDATE jobs SET status = ?, finished = ?, result = ?, error = ?, error_status = ? WHERE id = ?",
+            (status, time.time(), json.dumps(result) if result is not None else None, error, error_status, job_id),
+        )
+
+    def release(self, job_id: str) -> None:
+        self._exec(
+            "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'running' AND cancel = 1",
+            (time.time(), job_id),
+        )
+        self._exec(
+            "UPDATE jobs SET status = 'queued', owner = NULL, started = NULL WHERE id = ? AND status = 'running' AND pinned = 0",
+            (job_id,),
+        )
+        self._exec(
+            "UPDATE jobs SET status = 'failed', finished = ?, error = 'worker interrompido' WHERE id = ? AND status = 'running'",
+            (time.time(), job_id),
+        )
+
+    def request_cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        # queued jobs are cancelled right away; running ones are flagged for their owner
+        self._exec(
+            "UPDATE jobs SET status = 'cancelled', cancel = 1, finished = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id),
+        )
+        self._exec("UPDATE jobs SET cancel = 1 WHERE id = ? AND status = 'running'", (job_id,))
+        return self.get(job_id)
+
+    def cancelled_running(self, owner: str) -> List[str]:
+        rows = self._exec("SELECT id FROM jobs WHERE status = 'running' AND owner = ? AND cancel = 1", (owner,))
+        return [r["id"] for r in rows.fetchall()]
+
+    def heartbeat(self, owner: str, stale_after: float) -> None:
+        now = time.time()
+        self._exec("INSERT OR REPLACE INTO workers (id, seen) VALUES (?, ?)", (owner, now))
+        alive = "(SELECT id FROM workers WHERE seen > ?)"
+        # a cancel requested while the dead worker was running it still stands
+        self._exec(
+            f"UPDATE jobs SET status = 'cancelled', finished = ? "
+            f"WHERE status = 'running' AND cancel = 1 AND owner NOT IN {alive}",
+            (now, now - stale_after),
+        )
+        # unpinned jobs of a dead worker go back to the queue; pinned ones lost their secrets
+        self._exec(
+            f"UPDATE jobs SET status = 'queued', owner = NULL, started = NULL "
+            f"WHERE status = 'running' AND pinned = 0 AND owner NOT IN {alive}",
+            (now - stale_after,),
+        )
+        self._exec(
+            f"UPDATE jobs SET status = 'failed', finished = ?, error = 'worker interrompido' "
+            f"WHERE status IN ('queued', 'running') AND pinned = 1 AND owner NOT IN {alive}",
+            (now, now - stale_after),
+        )
+        self._exec("DELETE FROM workers WHERE seen <= ?", (now - stale_after,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+RunFn = Callable[[Dict[str, Any], Callable[[str, Dict[str, Any]], None]], Awaitable[Any]]
+
+class JobRunner:
+    def __init__(self, store: JobStore, run: RunFn, concurrency: int = 2, poll_seconds: float = 1.0, stale_after: float = 60.0):
+        self.store = store
+        self.run = run
+        self.concurrency = max(1, concurrency)
+        self.poll_seconds = poll_seconds
+        self.stale_after = stale_after
+        self.id = uuid.uuid4().hex
+        self._secrets: Dict[str, Dict[str, Any]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled: set = set()
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self.store.heartbeat(self.id, self.stale_after)
+        self._tasks = [asyncio.create_task(self._slot()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._supervise()))
+
+    async def stop(self) -> None:
+        # slots cancel their own job and wait for it, so every job has released or finished
+        # its row before this returns (and before the caller closes the store)
+        self._stopping = True
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, request: Dict[str, Any]) -> str:
+        secrets = {k: request[k] for k in SECRET_FIELDS if request.get(k)}
+        job_id = self.store.create(request, self.id if secrets else None)
+        if secrets:
+            self._secrets[job_id] = secrets
+        if self._wake is not None:
+            self._wake.set()
+        return job_id
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self.store.request_cancel(job_id)
+        self._secrets.pop(job_id, None)
+        self._cancel_local(job_id)
+        return job
+
+    def _cancel_local(self, job_id: str) -> None:
+        task = self._running.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+
+    async def _slot(self) -> None:
+        while True:
+            job = self.store.claim(self.id)
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.create_task(self._execute(job))
+            self._running[job["id"]] = task
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.done():  # the runner is stopping, not just this job
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    raise
+                if self._stopping:  # the job ended while the slot was being cancelled
+                    raise
+            finally:
+                self._running.pop(job["id"], None)
+
+    async def _execute(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        request = {**job["request"], **self._secrets.pop(job_id, {})}
+
+        def emit(event: str, data: Dict[str, Any]) -> None:
+            if event == "stage":
+                self.store.record_stage(job_id, data["stage"], data["seconds"])
+            elif event == "progress":
+                self.store.record_progress(job_id, data)
+
+        try:
+            result = await self.run(request, emit)
+        except asyncio.CancelledError:
+            if job_id in self._cancelled:
+                self._cancelled.discard(job_id)
+                self.store.finish(job_id, "cancelled")
+            else:
+                self.store.release(job_id)  # shutting down: let another worker pick it up
+            raise
+        except Exception as e:
+            status = getattr(e, "status_code", 500)
+            detail = getattr(e, "detail", None) or f"{type(e).__name__}: {e}"
+            if status >= 500:
+                log.exception("job %s failed", job_id)
+            self.store.finish(job_id, "failed", error=str(detail), error_status=status)
+        else:
+            self.store.finish(job_id, "done", result=result)
+
+    async def _supervise(self) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                self.store.heartbeat(self.id, self.stale_after)
+                for job_id in self.store.cancelled_running(self.id):
+                    self._cancel_local(job_id)
+            except sqlite3.Error:
+                log.exception("job supervisor")
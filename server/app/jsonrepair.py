@@ -0,0 +1,171 @@
+# Tolerant JSON recovery for LLM output: markdown fences, prose around the object,
+# trailing commas, and answers cut off mid-object (max_tokens); a value cut off mid-string
+# is dropped rather than closed.
+import re, json
+from typing import Any, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib decoder is used instead
+    orjson = None
+
+MAX_CUT_ATTEMPTS = 32
+MAX_SCAN_RESTARTS = 8
+# structural characters outside strings; inside a string only a quote or a backslash matters
+_STRUCTURAL = re.compile(r'[{}\[\]"]')
+_STRING_STOP = re.compile(r'["\\]')
+_NON_SPACE = re.compile(r"\S")
+
+def loads(s: str) -> Optional[Any]:
+    # orjson when installed; it rejects raw control characters inside strings, which models
+    # emit, so the tolerant stdlib decoder gets a second look. None instead of raising.
+    if orjson is not None:
+        try:
+            return orjson.loads(s)
+        except (ValueError, RecursionError):
+            pass
+    try:
+        return json.loads(s, strict=False)
+    except (ValueError, RecursionError):
+        return None
+
+def object_spans(text: str) -> List[Tuple[int, int]]:
+    # (start, end) of every balanced top-level {...} in text, string- and escape-aware.
+    # Regex searches only jump to the next character that matters (no backtracking). A "{"
+    # not followed by '"' or "}" is prose and skipped; an object still open at the end of the
+    # text ends the scan (anything after it is nested in it); a mismatched closer retries
+    # from the next "{" at most MAX_SCAN_RESTARTS times. The scan stays linear in len(text).
+    spans: List[Tuple[int, int]] = []
+    n = len(text)
+    pos = restarts = 0
+    while True:
+        start = text.find("{", pos)
+        if start < 0:
+            return spans
+        first = _NON_SPACE.search(text, start + 1)
+        if first is None or first.group() not in '"}':
+            pos = start + 1
+            continue
+        stack: List[str] = []
+        i, end = start, -1
+        while end < 0:
+            mt = _STRUCTURAL.search(text, i)
+            if mt is None:
+                i = n
+                break
+            ch, i = mt.group(), mt.end()
+            if ch == '"':
+                while True:
+                    stop = _STRING_STOP.search(text, i)
+                    if stop is None:
+                        i = n + 1  # unterminated string
+                        break
+                    i = stop.end() + (1 if stop.group() == "\\" else 0)
+                    if stop.group() == '"':
+                        break
+                if i > n:
+                    break
+            elif ch in "{[":
+                stack.append("}" if ch == "{" else "]")
+            else:
+                if not stack or stack.pop() != ch:
+                    break  # mismatched closer
+                if not stack:
+                    end = i
+        if end >= 0:
+            spans.append((start, end))
+            pos = end
+            continue
+        if i >= n:
+            return spans  # truncated: what follows is inside this object
+        restarts += 1
+        if restarts > MAX_SCAN_RESTARTS:
+            return spans
+        pos = start + 1
+
+def _unfence(text: str) -> str:
+    # keep what is inside the first ``` fence, even if the closing fence never came
+    i = text.find("```")
+    if i < 0:
+        return text
+    nl = text.find("\n", i)
+    if nl < 0:
+        return text
+    end = text.find("```", nl)
+    return text[nl + 1:end if end >= 0 else len(text)]
+
+def _loads(s: str) -> Optional[Any]:
+    try:
+        return json.loads(s, strict=False)  # strict=False: raw newlines/tabs inside strings
+    except ValueError:
+        return None
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    j = len(out) - 1
+    while j >= 0 and out[j].isspace():
+        j -= 1
+    if j >= 0 and out[j] == ",":
+        del out[j]
+
+def _close(prefix: str, stack: Tuple[str, ...]) -> str:
+    body = prefix.rstrip()
+    while body.endswith(","):
+        body = body[:-1].rstrip()
+    if body.endswith(":"):
+        body += " null"
+    return body + "".join(reversed(stack))
+
+def repair_json(text: str) -> Optional[Any]:
+    s = _unfence(text or "")
+    starts = [i for i in (s.find("{"), s.find("[")) if i >= 0]
+    if not starts:
+        return None
+    s = s[min(starts):]
+
+    out: List[str] = []
+    stack: List[str] = []
+    cuts: List[Tuple[int, Tuple[str, ...]]] = []  # (position of a comma, open containers there)
+    in_str = esc = False
+    for ch in s:
+        if in_str:
+            out.append(ch)
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+            continue
+        if ch == '"':
+            in_str = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if not stack or stack[-1] != ch:
+                continue  # stray closer
+            stack.pop()
+            out.append(ch)
+            if not stack:
+                break  # top-level value complete; ignore trailing prose
+            continue
+        elif ch == ",":
+            cuts.append((len(out), tuple(stack)))
+        out.append(ch)
+
+    if not in_str and not stack:
+        return _loads("".join(out))
+
+    # truncated: close what is open, then fall back to cutting at earlier commas. A string
+    # cut mid-way is never closed: half a file's "content" must not pass for a whole one,
+    # so the value it belongs to is dropped by cutting back to the comma before it
+    tail = "".join(out)
+    if not in_str:
+        j = _loads(_close(tail, tuple(stack)))
+        if j is not None:
+            return j
+    for pos, st in reversed(cuts[-MAX_CUT_ATTEMPTS:]):
+        j = _loads(_close(tail[:pos], st))
+        if j is not None:
+            return j
+    return None
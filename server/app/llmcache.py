@@ -0,0 +1,69 @@
+# In-process cache of LLM completions.
+# Keyed by a hash of everything that shapes the answer (provider URL, model, sampling
+# params, messages); entries expire after a TTL and the oldest are dropped first once
+# the cache holds more than max_bytes of text.
+import os, json, time, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+def llm_cache_key(api_url: str, model: str, params: Dict[str, Any], messages: List[Dict[str, Any]]) -> str:
+    raw = json.dumps([api_url, model, params, messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    def __init__(self, ttl: float, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMCache"]:
+        ttl = float(os.getenv("LLM_CACHE_TTL", "3600"))
+        max_mb = float(os.getenv("LLM_CACHE_MAX_MB", "64"))
+        if ttl <= 0 or max_mb <= 0:
+            return None
+        return cls(ttl, int(max_mb * 1024 * 1024))
+
+    def _drop(self, key: str) -> None:
+        _, text = self._data.pop(key)
+        self._bytes -= len(text)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: str, text: str) -> None:
+        if not text or len(text) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (time.monotonic() + self.ttl, text)
+            self._bytes += len(text)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "entries": len(self._data), "bytes": self._bytes}
@@ -0,0 +1,192 @@
+# Sources that never touch the GitHub API: a directory already checked out on this host
+# (CI runners) and bare mirrors kept under MIRROR_CACHE_DIR, updated with an incremental
+# `git fetch` and read with one long-lived `git cat-file --batch`. Both take the same path
+# matcher as the GitHub crawl and yield (path, bytes) lazily so the caller's limits stop them.
+import os, re, mmap, threading, subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+SKIP_DIRS = frozenset({".git", ".hg", ".svn"})
+_REPO_RE = re.compile(r"^[\w-][\w.-]*/[\w-][\w.-]*$")
+_SHA_RE = re.compile(r"^[0-9a-f]{40}(?:[0-9a-f]{24})?$")
+
+def resolve_local_path(path: str, roots: List[str]) -> str:
+    # requests may only read below the configured roots (symlinks resolved first)
+    real = os.path.realpath(path)
+    for root in roots:
+        r = os.path.realpath(root)
+        if real == r or real.startswith(r.rstrip(os.sep) + os.sep):
+            if not os.path.isdir(real):
+                raise ValueError(f"diretório não encontrado: {path}")
+            return real
+    raise ValueError(f"local_path fora de LOCAL_SOURCE_ROOTS: {path}")
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""  # mmap refuses empty files
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm[:]
+
+def _scan(root: str, rel_dir: str, matcher: Any) -> Tuple[List[str], List[str]]:
+    # one directory -> (subdirectories worth entering, matching files), both relative to root
+    dirs: List[str] = []
+    files: List[str] = []
+    try:
+        with os.scandir(os.path.join(root, rel_dir)) as it:
+            for e in it:
+                rel = f"{rel_dir}{e.name}"
+                if e.is_symlink():
+                    continue  # may point outside the root
+                if e.is_dir():
+                    if e.name not in SKIP_DIRS and matcher.dir_may_match(rel + "/"):
+                        dirs.append(rel + "/")
+                elif e.is_file() and matcher.allowed(rel):
+                    files.append(rel)
+    except OSError:
+        pass
+    return dirs, files
+
+def walk_files(root: str, matcher: Any, pool: ThreadPoolExecutor) -> List[str]:
+    # level by level, each level's directories scanned concurrently; sorted like a git tree listing
+    found: List[str] = []
+    level = [""]
+    while level:
+        nxt: List[str] = []
+        for dirs, files in pool.map(lambda d: _scan(root, d, matcher), level):
+            nxt.extend(dirs)
+            found.extend(files)
+        level = nxt
+    return sorted(found)
+
+def _ordered(pool: ThreadPoolExecutor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    # pool.map in input order with at most `window` results in flight, so a caller that stops
+    # early has not read the whole tree
+    pending: deque = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def iter_local_blobs(root: str, matcher: Any, workers: int) -> Iterator[Tuple[str, Optional[bytes]]]:
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        paths = walk_files(root, matcher, pool)
+
+        def load(rel: str) -> Tuple[str, Optional[bytes]]:
+            try:
+                return rel, read_file(os.path.join(root, rel))
+            except OSError:
+                return rel, None
+        yield from _ordered(pool, load, paths, workers * 2)
+
+class MirrorCache:
+    def __init__(self, root: str, remote_template: str = "https://github.com/{repo}.git", timeout: float = 600.0):
+        self.root = root
+        self.remote_template = remote_template
+        self.timeout = timeout
+        self.fetches = 0
+        self.clones = 0
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["MirrorCache"]:
+        root = (os.getenv("MIRROR_CACHE_DIR") or "").strip()
+        if not root or root.lower() == "off":
+            return None
+        return cls(root, os.getenv("MIRROR_REMOTE", "https://github.com/{repo}.git"))
+
+    def path_for(self, repo: str) -> str:
+        if not _REPO_RE.match(repo or ""):
+            raise ValueError(f"repo inválido para mirror: {repo}")
+        return os.path.join(self.root, repo.replace("/", "__") + ".git")
+
+    def _git(self, path: Optional[str], *args: str) -> bytes:
+        cmd = ["git"] + (["-C", path] if path else []) + list(args)
+        env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        r = subprocess.run(cmd, capture_output=True, timeout=self.timeout, env=env)
+        if r.returncode != 0:
+            raise RuntimeError(f"git {args[0]} falhou: {r.stderr.decode(errors='replace').strip()}")
+        return r.stdout
+
+    def _repo_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    def sync(self, repo: str, ref: Optional[str]) -> Tuple[str, str]:
+        # clone once, then fetch only what changed; -> (mirror path, commit sha of ref)
+        path = self.path_for(repo)
+        with self._repo_lock(path):
+            if os.path.isdir(path):
+                self._git(path, "fetch", "--prune", "--quiet", "origin")
+                self.fetches += 1
+            else:
+                tmp = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+                self._git(None, "clone", "--mirror", "--quiet", self.remote_template.format(repo=repo), tmp)
+                os.replace(tmp, path)
+                self.clones += 1
+        return path, self.resolve(path, ref)
+
+    def resolve(self, path: str, ref: Optional[str]) -> str:
+        # unknown ref falls back to the remote's default branch, like the GitHub crawl
+        for cand in ([ref] if ref else []) + ["HEAD"]:
+            try:
+                return self._git(path, "rev-parse", "--verify", "--quiet", f"{cand}^{{commit}}").decode().strip()
+            except RuntimeError:
+                continue
+        raise ValueError("ref não encontrado no mirror")
+
+    def changed_files(self, path: str, base: str, head: str) -> Optional[Tuple[Set[str], Set[str]]]:
+        # same contract as the GitHub compare: None when base is unknown or not an ancestor
+        if not _SHA_RE.match(base or ""):
+            return None
+        try:
+            self._git(path, "merge-base", "--is-ancestor", base, head)
+        except RuntimeError:
+            return None
+        out = self._git(path, "diff", "--name-status", "--no-renames", "-z", base, head)
+        fields = out.decode("utf-8", errors="replace").split("\0")
+        changed: Set[str] = set()
+        removed: Set[str] = set()
+        for status, name in zip(fields[0::2], fields[1::2]):
+            (removed if status == "D" else changed).add(name)
+        return changed, removed
+
+    def iter_blobs(self, path: str, sha: str, matcher: Any) -> Iterator[Tuple[str, Optional[bytes]]]:
+        # ls-tree picks the paths, one cat-file --batch process streams their contents
+        listing = self._git(path, "ls-tree", "-r", "-z", sha).decode("utf-8", errors="replace")
+        entries = []
+        for rec in listing.split("\0"):
+            if not rec:
+                continue
+            meta, name = rec.split("\t", 1)
+            mode, typ, obj = meta.split(" ")
+            if typ == "blob" and mode != "120000" and matcher.allowed(name):
+                entries.append((name, obj))
+        if not entries:
+            return
+        proc = subprocess.Popen(["git", "-C", path, "cat-file", "--batch"],
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            for name, obj in entries:
+                proc.stdin.write(obj.encode() + b"\n")
+                proc.stdin.flush()
+                header = proc.stdout.readline().split()
+                if len(header) < 3 or header[1] != b"blob":
+                    yield name, None
+                    continue
+                size = int(header[2])
+                data = proc.stdout.read(size)
+                proc.stdout.read(1)  # trailing newline
+                yield name, data
+        finally:
+            proc.stdin.close()
+            proc.kill()
+            proc.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"root": self.root, "clones": self.clones, "fetches": self.fetches}
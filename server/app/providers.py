@@ -0,0 +1,166 @@
+# Ordered pool of LLM providers with hedged requests and failover.
+# The request's own provider goes first. When it has not answered after its rolling p95
+# latency, one hedged request goes to a secondary and the first acceptable answer wins;
+# a 5xx or timeout fails over to the next provider in order. Per-provider latency and
+# outcome counters are kept for tuning the routing.
+import os, json, time, random, asyncio, threading
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+import httpx
+
+LATENCY_WINDOW = 200  # successful calls kept per provider for the percentiles
+MIN_SAMPLES = 20      # below this the p95 is too noisy; DEFAULT_HEDGE_SECONDS is used instead
+
+class Provider(NamedTuple):
+    url: str
+    key: str
+    model: str
+    weight: float = 1.0
+
+    @property
+    def name(self) -> str:
+        return f"{self.url}#{self.model}"
+
+def parse_providers(raw: Optional[str]) -> List[Provider]:
+    # LLM_PROVIDERS='[{"url": ..., "key": ..., "model": ..., "weight": 1}, ...]'
+    out = []
+    for item in json.loads(raw) if raw and raw.strip() else []:
+        out.append(Provider(item["url"], item.get("key", ""), item["model"], float(item.get("weight", 1.0))))
+    return out
+
+def failover_error(e: BaseException) -> bool:
+    if isinstance(e, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)):
+        return True
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500 or e.response.status_code == 429
+    return False
+
+class ProviderStats:
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.hedges = 0  # times a hedge was sent because this provider was slow
+        self.wins = 0    # times this provider's answer was the one used
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        xs = sorted(self.latencies)
+        return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95, p99 = (self.percentile(q) for q in (0.5, 0.95, 0.99))
+        return {"calls": self.calls, "errors": self.errors, "hedges": self.hedges, "wins": self.wins,
+                "p50": p50 and round(p50, 3), "p95": p95 and round(p95, 3), "p99": p99 and round(p99, 3)}
+
+class ProviderPool:
+    def __init__(self, providers: List[Provider], default_hedge_seconds: float = 20.0, hedge: bool = True):
+        self.providers = providers
+        self.default_hedge_seconds = default_hedge_seconds
+        self.hedge = hedge
+        self._stats: Dict[str, ProviderStats] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ProviderPool":
+        return cls(
+            parse_providers(os.getenv("LLM_PROVIDERS")),
+            float(os.getenv("LLM_HEDGE_DEFAULT_SECONDS", "20")),
+            os.getenv("LLM_HEDGE", "1").strip().lower() not in ("0", "false", "no", "off"),
+        )
+
+    def stats_for(self, p: Provider) -> ProviderStats:
+        with self._lock:
+            return self._stats.setdefault(p.name, ProviderStats())
+
+    def route(self, primary: Provider) -> List[Provider]:
+        return [primary] + [p for p in self.providers if p[:3] != primary[:3]]
+
+    def hedge_delay(self, p: Provider) -> float:
+        st = self.stats_for(p)
+        if len(st.latencies) < MIN_SAMPLES:
+            return self.default_hedge_seconds
+        return st.percentile(0.95)
+
+    def _pick_hedge(self, candidates: List[Provider]) -> Provider:
+        weighted = [p for p in candidates if p.weight > 0]
+        if not weighted:
+            return candidates[0]
+        return random.choices(weighted, weights=[p.weight for p in weighted])[0]
+
+    async def _timed(self, p: Provider, call: Callable[[Provider], Awaitable[str]]) -> str:
+        st = self.stats_for(p)
+        t0 = time.perf_counter()
+        try:
+            text = await call(p)
+        except asyncio.CancelledError:
+            raise  # lost the race: says nothing about the provider
+        except BaseException:
+            with self._lock:
+                st.calls += 1
+                st.errors += 1
+            raise
+        with self._lock:
+            st.calls += 1
+            st.latencies.append(time.perf_counter() - t0)
+        return text
+
+    async def run(self, providers: List[Provider], call: Callable[[Provider], Awaitable[str]],
+                  accept: Optional[Callable[[str], bool]] = None) -> Tuple[str, Provider]:
+        # -> (answer, provider that gave it). providers[0] first; one hedge after its p95;
+        # failover on 5xx/timeout. An answer that fails accept() is only used when nothing
+        # better arrives.
+        pending = list(providers)
+        tasks: Dict[asyncio.Task, Provider] = {}
+        hedged = not self.hedge
+        fallback: Optional[Tuple[str, Provider]] = None
+        error: Optional[BaseException] = None
+
+        def start() -> Provider:
+            p = pending.pop(0)
+            tasks[asyncio.create_task(self._timed(p, call))] = p
+            return p
+
+        first = start()
+        try:
+            while tasks:
+                timeout = None if hedged or not pending else self.hedge_delay(first)
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    st = self.stats_for(first)
+                    with self._lock:
+                        st.hedges += 1
+                    hp = self._pick_hedge(pending)
+                    pending.remove(hp)
+                    pending.insert(0, hp)
+                    start()
+                    continue
+                for t in done:
+                    p = tasks.pop(t)
+                    try:
+                        text = t.result()
+                    except Exception as e:
+                        error = e
+                        if failover_error(e) and pending and not tasks:
+                            start()
+                        continue
+                    if accept is None or accept(text):
+                        st = self.stats_for(p)
+                        with self._lock:
+                            st.wins += 1
+                        return text, p
+                    if fallback is None:
+                        fallback = (text, p)
+            if fallback is not None:
+                return fallback
+            raise error
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: st.snapshot() for name, st in self._stats.items()}
@@ -0,0 +1,156 @@
+# Client-side rate limiting for LLM providers, shared by every request in the process.
+# One limiter per provider endpoint + API key holds requests-per-minute and tokens-per-minute
+# token buckets. Limits start unknown (or at LLM_RATE_RPM/LLM_RATE_TPM) and are learned from
+# the x-ratelimit-* response headers; a 429 pauses every caller of that key at once instead of
+# each request sleeping and retrying on its own. Waiters are served in arrival order.
+import os, re, time, asyncio, hashlib, weakref
+from typing import Any, Dict, Mapping, Optional
+
+_DURATION = re.compile(r"(?P<n>\d+(?:\.\d+)?)(?P<u>ms|h|m|s)")
+_UNIT = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_reset(value: Any) -> Optional[float]:
+    # "1s", "6m0s", "2m59.56s", "120ms" or plain seconds -> seconds
+    if value is None:
+        return None
+    s = str(value).strip()
+    try:
+        return float(s)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(s)
+    if not parts:
+        return None
+    return sum(float(n) * _UNIT[u] for n, u in parts)
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    # per-minute budget refilled continuously; capacity 0 means "no known limit"
+    def __init__(self, per_minute: float = 0.0):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        # a single call bigger than the whole bucket waits for a full bucket, not forever
+        need = min(amount, self.capacity) - self.level
+        return 0.0 if need <= 0 else need * 60.0 / self.capacity
+
+    def take(self, amount: float, now: float) -> None:
+        if self.capacity > 0:
+            self._refill(now)
+            self.level -= amount
+
+    def give_back(self, amount: float) -> None:
+        if self.capacity > 0:
+            self.level = min(self.capacity, self.level + amount)
+
+    def learn(self, limit: Optional[float], remaining: Optional[float], now: float) -> None:
+        known = self.capacity > 0
+        if limit:
+            self.capacity = limit
+        if remaining is not None and self.capacity > 0:
+            self._refill(now)
+            # the provider's count includes other processes and keys' shared quotas
+            self.level = min(self.level, remaining) if known else remaining
+
+class ProviderLimiter:
+    def __init__(self, rpm: float = 0.0, tpm: float = 0.0):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0
+        self.waited = 0
+        self.throttled = 0
+        self._lock = asyncio.Lock()  # FIFO: the first caller to queue is the first served
+
+    async def acquire(self, tokens: int) -> None:
+        async with self._lock:
+            waited = False
+            while True:
+                now = time.monotonic()
+                delay = max(self.blocked_until - now,
+                            self.requests.wait_time(1, now),
+                            self.tokens.wait_time(tokens, now))
+                if delay <= 0:
+                    break
+                waited = True
+                await asyncio.sleep(delay)
+            self.waited += waited
+            self.requests.take(1, now)
+            self.tokens.take(tokens, now)
+
+    def settle(self, reserved: int, used: int) -> None:
+        # replace the up-front estimate with what the provider actually counted
+        if reserved > used:
+            self.tokens.give_back(reserved - used)
+        elif used > reserved:
+            self.tokens.take(used - reserved, time.monotonic())
+
+    def backoff(self, seconds: float) -> None:
+        self.throttled += 1
+        self.blocked_until = max(self.blocked_until, time.monotonic() + max(0.0, seconds))
+
+    def observe(self, headers: Optional[Mapping[str, Any]]) -> None:
+        if not headers:
+            return
+        h = {str(k).lower(): v for k, v in headers.items()}
+        now = time.monotonic()
+        for name, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+            limit = _number(h.get(f"x-ratelimit-limit-{name}"))
+            remaining = _number(h.get(f"x-ratelimit-remaining-{name}"))
+            bucket.learn(limit, remaining, now)
+            reset = parse_reset(h.get(f"x-ratelimit-reset-{name}"))
+            if remaining is not None and remaining <= 0 and reset:
+                self.blocked_until = max(self.blocked_until, now + reset)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rpm": self.requests.capacity or None,
+            "tpm": self.tokens.capacity or None,
+            "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 3),
+            "waited": self.waited,
+            "throttled": self.throttled,
+        }
+
+class RateLimiters:
+    # asyncio primitives belong to one event loop, so limiters are kept per loop
+    def __init__(self, rpm: float = 0.0, tpm: float = 0.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._by_loop: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, ProviderLimiter]]" = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def from_env(cls) -> "RateLimiters":
+        return cls(float(os.getenv("LLM_RATE_RPM", "0")), float(os.getenv("LLM_RATE_TPM", "0")))
+
+    @staticmethod
+    def key(api_url: str, api_key: str) -> str:
+        return hashlib.sha256(f"{api_url}\0{api_key}".encode("utf-8")).hexdigest()[:16]
+
+    def get(self, api_url: str, api_key: str) -> ProviderLimiter:
+        limiters = self._by_loop.setdefault(asyncio.get_running_loop(), {})
+        k = self.key(api_url, api_key)
+        lim = limiters.get(k)
+        if lim is None:
+            lim = limiters[k] = ProviderLimiter(self.rpm, self.tpm)
+        return lim
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for limiters in list(self._by_loop.values()):
+            for k, lim in limiters.items():
+                out[k] = lim.stats()
+        return out
@@ -0,0 +1,190 @@
+# Syntax checks for the files the model suggested: ast.parse for Python, a tokenizer-level
+# bracket check for Java and JavaScript (strings, comments, template literals and regex
+# literals are skipped, so a brace inside them does not count). Workers are plain functions on
+# (path, content) tuples so a process pool can run them; other languages are left unchecked.
+import ast, re, warnings
+from typing import Any, Dict, List, Optional, Tuple
+
+# one alternation instead of a search per pattern; IGNORECASE instead of a lowercased copy
+PLACEHOLDER_RE = re.compile(r"conte[uú]do do arquivo|resultados? dispon[ií]vel|placeholder", re.IGNORECASE)
+
+LANGUAGES = {".py": "python", ".pyw": "python", ".java": "java", ".js": "js", ".mjs": "js", ".cjs": "js"}
+
+_OPEN = {"{": "}", "(": ")", "[": "]"}
+_CLIKE_STOP = re.compile(r"[{}()\[\]\"'`/]")
+_QUOTE_STOP = {q: re.compile(f"[{q}\\\\\n]") for q in "\"'"}
+_TEMPLATE_STOP = re.compile(r"[`\\$]")
+_REGEX_STOP = re.compile(r"[/\\\[\n]")
+_CLASS_STOP = re.compile(r"[\]\\\n]")
+# a "/" after one of these (or after a keyword below) starts a regex literal, not a division
+_REGEX_AFTER = frozenset("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = frozenset({"return", "typeof", "case", "do", "else", "in", "of", "new", "delete",
+                             "void", "throw", "yield", "await", "instanceof"})
+_WORD_BEFORE = re.compile(r"([A-Za-z_$][\w$]*)\s*$")
+
+def looks_like_placeholder(text: str) -> bool:
+    t = text or ""
+    return len(t.strip()) < 8 or PLACEHOLDER_RE.search(t) is not None
+
+def language_for(path: str) -> Optional[str]:
+    dot = path.rfind(".")
+    return LANGUAGES.get(path[dot:].lower()) if dot >= 0 else None
+
+def _line(src: str, pos: int) -> int:
+    return src.count("\n", 0, pos) + 1
+
+def _error(src: str, pos: int, message: str) -> Dict[str, Any]:
+    # 1-based line and column, like SyntaxError
+    return {"line": _line(src, pos), "col": pos - src.rfind("\n", 0, pos), "message": message}
+
+def _check_python(src: str) -> Optional[Dict[str, Any]]:
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # invalid escape sequences and the like
+            ast.parse(src)
+    except SyntaxError as e:
+        return {"line": e.lineno or 0, "col": e.offset or 0, "message": e.msg}
+    except (ValueError, RecursionError, MemoryError) as e:  # null bytes, nesting too deep
+        return {"line": 0, "col": 0, "message": str(e) or type(e).__name__}
+    return None
+
+def _skip_quoted(src: str, i: int, quote: str) -> int:
+    # i is just past the opening quote -> index past the closing one, or -1 at a line end
+    stop = _QUOTE_STOP[quote]
+    while True:
+        mt = stop.search(src, i)
+        if mt is None or mt.group() == "\n":
+            return -1
+        if mt.group() == "\\":
+            i = mt.end() + 1
+            continue
+        return mt.end()
+
+def _skip_template(src: str, i: int) -> Tuple[int, bool]:
+    # i is inside a template literal -> (index past "`" or "${", True if it was "${"); (-1, _) if unterminated
+    while True:
+        mt = _TEMPLATE_STOP.search(src, i)
+        if mt is None:
+            return -1, False
+        ch, i = mt.group(), mt.end()
+        if ch == "\\":
+            i += 1
+        elif ch == "`":
+            return i, False
+        elif src.startswith("{", i):
+            return i + 1, True
+
+def _regex_allowed(src: str, pos: int) -> bool:
+    j = pos - 1
+    while j >= 0 and src[j] in " \t\r\n":
+        j -= 1
+    if j < 0 or src[j] in _REGEX_AFTER:
+        return True
+    mt = _WORD_BEFORE.search(src, max(0, j - 15), j + 1)
+    return bool(mt) and mt.group(1) in _REGEX_KEYWORDS
+
+def _skip_regex(src: str, i: int) -> int:
+    # i is past the opening "/" -> index past the closing one, or -1 if the line ends first
+    while True:
+        mt = _REGEX_STOP.search(src, i)
+        if mt is None or mt.group() == "\n":
+            return -1
+        ch, i = mt.group(), mt.end()
+        if ch == "\\":
+            i += 1
+        elif ch == "/":
+            return i
+        else:  # character class: "/" does not end the literal inside it
+            while True:
+                mc = _CLASS_STOP.search(src, i)
+                if mc is None or mc.group() == "\n":
+                    return -1
+                i = mc.end() + (1 if mc.group() == "\\" else 0)
+                if mc.group() == "]":
+                    break
+
+def _check_clike(src: str, js: bool) -> Optional[Dict[str, Any]]:
+    stack: List[Tuple[str, int]] = []  # (opener, position); "${" resumes a template when closed
+    n = len(src)
+    i = 0
+    while True:
+        mt = _CLIKE_STOP.search(src, i)
+        if mt is None:
+            break
+        ch, pos, i = mt.group(), mt.start(), mt.end()
+        if ch == "/":
+            nxt = src[i:i + 1]
+            if nxt == "/":
+                end = src.find("\n", i)
+                i = n if end < 0 else end
+            elif nxt == "*":
+                end = src.find("*/", i + 1)
+                if end < 0:
+                    return _error(src, pos, "comentário não fechado")
+                i = end + 2
+            elif js and _regex_allowed(src, pos):
+                end = _skip_regex(src, i)
+                if end >= 0:  # otherwise it was a division after all
+                    i = end
+        elif ch == '"' and not js and src.startswith('""', i):
+            end = src.find('"""', i + 2)  # Java text block
+            if end < 0:
+                return _error(src, pos, "text block não fechado")
+            i = end + 3
+        elif ch in "\"'":
+            i = _skip_quoted(src, i, ch)
+            if i < 0:
+                return _error(src, pos, "string não terminada")
+        elif ch == "`":
+            if not js:
+                continue
+            i, expr = _skip_template(src, i)
+            if i < 0:
+                return _error(src, pos, "template literal não fechado")
+            if expr:
+                stack.append(("${", pos))
+        elif ch in _OPEN:
+            stack.append((ch, pos))
+        else:
+            if not stack:
+                return _error(src, pos, f"'{ch}' sem abertura")
+            opener, at = stack.pop()
+            want = "}" if opener == "${" else _OPEN[opener]
+            if ch != want:
+                return _error(src, pos, f"esperado '{want}' (aberto na linha {_line(src, at)}), encontrado '{ch}'")
+            if opener == "${":
+                i, expr = _skip_template(src, i)
+                if i < 0:
+                    return _error(src, at, "template literal não fechado")
+                if expr:
+                    stack.append(("${", i - 2))
+    if stack:
+        opener, at = stack[-1]
+        return _error(src, at, f"'{opener}' não fechado")
+    return None
+
+def check_file(path: str, content: str) -> Tuple[Optional[bool], Optional[Dict[str, Any]]]:
+    # -> (valid, error {line, col, message}); valid is None for languages without a checker
+    lang = language_for(path)
+    if lang is None:
+        return None, None
+    err = _check_python(content) if lang == "python" else _check_clike(content, js=lang == "js")
+    return err is None, err
+
+def check_files(items: List[Tuple[str, str]]) -> List[Tuple[Optional[bool], Optional[Dict[str, Any]]]]:
+    # one process pool task per batch, so small files do not pay a round trip each
+    return [check_file(path, content) for path, content in items]
+
+def batches(items: List[Tuple[str, str]], parts: int) -> List[List[Tuple[str, str]]]:
+    # contiguous batches of about the same total size, in input order
+    total = sum(len(c) for _, c in items) or 1
+    target = total / max(1, parts)
+    out: List[List[Tuple[str, str]]] = [[]]
+    size = 0
+    for item in items:
+        if out[-1] and size >= target:
+            out.append([])
+            size = 0
+        out[-1].append(item)
+        size += len(item[1])
+    return out
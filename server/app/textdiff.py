@@ -0,0 +1,72 @@
+# Unified diffs between the blobs a compare read and the files the model suggested.
+# Legacy files are long and suggestions usually touch a few lines, so the common head and tail
+# are trimmed before difflib sees the text; its cost then follows the changed region only.
+import re, difflib
+from itertools import islice
+from typing import List, Optional
+
+NO_EOL = "\\ No newline at end of file\n"
+_HUNK = re.compile(r"^@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@")
+
+def _common_ends(a: List[str], b: List[str]) -> "tuple[int, int]":
+    n = min(len(a), len(b))
+    head = 0
+    while head < n and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < n - head and a[-1 - tail] == b[-1 - tail]:
+        tail += 1
+    return head, tail
+
+def unified_diff(path: str, old: Optional[str], new: str, context: int = 3) -> str:
+    # old=None: the file is new. Returns "" when nothing changed.
+    a = old.splitlines(keepends=True) if old is not None else []
+    b = new.splitlines(keepends=True)
+    head, tail = _common_ends(a, b)
+    if head == len(a) == len(b):
+        return ""
+    lo = max(0, head - context)
+    cut = max(0, tail - context)
+    a_mid, b_mid = a[lo:len(a) - cut], b[lo:len(b) - cut]
+
+    out = ["--- /dev/null\n" if old is None else f"--- a/{path}\n", f"+++ b/{path}\n"]
+    for line in islice(difflib.unified_diff(a_mid, b_mid, n=context), 2, None):  # skip ---/+++
+        if line.startswith("@@"):
+            mt = _HUNK.match(line)
+            line = f"@@ -{int(mt.group(1)) + lo}{mt.group(2) or ''} +{int(mt.group(3)) + lo}{mt.group(4) or ''} @@\n"
+        out.append(line)
+        if not line.endswith("\n"):
+            out.append("\n" + NO_EOL)
+    return "".join(out)
+
+def apply_unified_diff(old: Optional[str], diff: str) -> str:
+    # rebuilds the new text from the original and a diff made by unified_diff
+    if not diff:
+        return old or ""
+    src = (old or "").splitlines(keepends=True)
+    out: List[str] = []
+    pos = 0
+    lines = diff.splitlines(keepends=True)
+    i = 2  # ---/+++ header
+    while i < len(lines):
+        mt = _HUNK.match(lines[i])
+        if not mt:
+            raise ValueError(f"linha inesperada no diff: {lines[i]!r}")
+        start = int(mt.group(1)) - (0 if mt.group(2) == ",0" else 1)
+        out.extend(src[pos:start])
+        pos = start
+        i += 1
+        while i < len(lines) and not lines[i].startswith("@@"):
+            tag, text = lines[i][:1], lines[i][1:]
+            if i + 1 < len(lines) and lines[i + 1] == NO_EOL:
+                text = text[:-1]
+                i += 1
+            if tag in (" ", "-"):
+                if src[pos] != text:
+                    raise ValueError("diff não corresponde ao original")
+                pos += 1
+            if tag in (" ", "+"):
+                out.append(text)
+            i += 1
+    out.extend(src[pos:])
+    return "".join(out)
@@ -1,4 +1,58 @@
 # server/tests/conftest.py
-import os, sys, pathlib
+import os, sys, json, time, pathlib, platform, statistics
+import pytest
+
 ROOT = pathlib.Path(__file__).resolve().parents[1]  # .../server
-sys.path.insert(0, str(ROOT))
\ No newline at end of file
+sys.path.insert(0, str(ROOT))
+
+# --- microbenchmarks (tests/test_bench.py) ---------------------------------------------
+# pytest -m benchmark --bench-save bench.json             record a run
+# pytest -m benchmark --bench-baseline bench.json         fail on regressions vs. a run
+def pytest_addoption(parser):
+    g = parser.getgroup("bench")
+    g.addoption("--bench-save", default=None, help="write benchmark results to this JSON file")
+    g.addoption("--bench-baseline", default=None, help="compare against results saved with --bench-save")
+    g.addoption("--bench-threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", "0.25")),
+                help="allowed slowdown vs. the baseline (0.25 = 25%%)")
+
+_BENCH_RESULTS = {}
+
+class _Bench:
+    def __init__(self, baseline, threshold):
+        self.baseline = baseline
+        self.threshold = threshold
+
+    def __call__(self, name, fn, repeat=5):
+        # best-of-N wall time: the minimum is the least noisy estimate of the code's cost
+        times = []
+        result = None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - t0)
+        _BENCH_RESULTS[name] = {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+        base = (self.baseline or {}).get(name)
+        if base:
+            limit = base["min"] * (1 + self.threshold)
+            assert min(times) <= limit, (
+                f"{name}: {min(times):.4f}s vs baseline {base['min']:.4f}s (+{self.threshold:.0%} allowed)"
+            )
+        return result
+
+@pytest.fixture(scope="session")
+def bench(pytestconfig):
+    path = pytestconfig.getoption("--bench-baseline")
+    baseline = None
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    return _Bench(baseline, pytestconfig.getoption("--bench-threshold"))
+
+def pytest_sessionfinish(session, exitstatus):
+    path = session.config.getoption("--bench-save")
+    if path and _BENCH_RESULTS:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"python": platform.python_version(), "machine": platform.machine(), "time": time.time()},
+                "results": _BENCH_RESULTS,
+            }, f, indent=2, sort_keys=True)
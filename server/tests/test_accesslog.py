@@ -0,0 +1,53 @@
+import io, json
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.accesslog import AccessLog, AccessLogMiddleware, redact_body
+
+def _app(access):
+    app = FastAPI()
+    app.add_middleware(AccessLogMiddleware, access=access)
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"n": len(await request.body())}
+    return app
+
+def _records(access, out):
+    access.stop()  # drains the queue
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+SECRET_BODY = {"repo": "o/r", "llm_api_key": "sk-live", "github_private_key_pem_b64": "LS0t",
+               "github_pat": "ghp_x", "token_budget": 1000, "nested": {"access_token": "t"}}
+
+def test_request_line_has_sizes_and_no_body_by_default():
+    out = io.StringIO()
+    access = AccessLog(name="test.access.a", stream=out)
+    access.start()
+    r = TestClient(_app(access)).post("/echo", json=SECRET_BODY)
+    assert r.status_code == 200
+    (rec,) = _records(access, out)
+    assert rec["method"] == "POST" and rec["path"] == "/echo" and rec["status"] == 200
+    assert rec["req_bytes"] == r.json()["n"] and rec["resp_bytes"] == len(r.content)
+    assert rec["duration_ms"] >= 0 and "body" not in rec
+
+def test_sampled_body_is_redacted():
+    out = io.StringIO()
+    access = AccessLog(name="test.access.b", sample=1.0, max_body=4096, stream=out, redact_fields=["repo"])
+    access.start()
+    TestClient(_app(access)).post("/echo", json=SECRET_BODY)
+    (rec,) = _records(access, out)
+    assert rec["body"] == {"repo": "***", "llm_api_key": "***", "github_private_key_pem_b64": "***",
+                           "github_pat": "***", "token_budget": 1000, "nested": {"access_token": "***"}}
+    assert rec["body_truncated"] is False
+
+def test_truncated_sample_still_redacts_secret_strings():
+    raw = json.dumps({"repo": "o/r", "llm_api_key": "sk-live-123456", "github_pat": "ghp_abcdef"}).encode()
+    cut = raw[: raw.index(b"ghp_") + 4]
+    text = redact_body(cut)
+    assert "sk-live" not in text and "ghp_" not in text and '"repo": "o/r"' in text
+
+def test_full_queue_drops_instead_of_blocking():
+    access = AccessLog(name="test.access.c", queue_size=2, stream=io.StringIO())
+    for _ in range(5):
+        access.emit({"path": "/x"})
+    assert access.handler.dropped == 3
@@ -0,0 +1,61 @@
+import asyncio
+import app.main as m
+
+class _R:
+    def __init__(self, status, content=None, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self._content = content
+    def raise_for_status(self): return None
+    def json(self): return self._content
+
+def _ok(text):
+    return _R(200, {"choices": [{"message": {"content": text}}]})
+
+def test_429_backoff_does_not_block_event_loop(monkeypatch):
+    state = {"calls": 0, "ticks": 0}
+    async def fake_post(url, **kw):
+        state["calls"] += 1
+        if state["calls"] == 1:
+            return _R(429, headers={"Retry-After": "0.05"})
+        return _ok("ok")
+    monkeypatch.setattr(m, "_http_post", fake_post)
+
+    async def ticker():
+        for _ in range(5):
+            await asyncio.sleep(0.005)
+            state["ticks"] += 1
+
+    async def main():
+        text, _ = await asyncio.gather(
+            m._openai_chat("https://x/v1/chat/completions", "k", "mdl", [{"role": "user", "content": "x"}]),
+            ticker(),
+        )
+        return text
+
+    assert asyncio.run(main()) == "ok"
+    assert state["calls"] == 2 and state["ticks"] == 5
+
+def test_concurrent_calls_overlap(monkeypatch):
+    monkeypatch.setattr(m, "llm_cache", None)
+    state = {"inflight": 0, "peak": 0}
+    async def fake_post(url, **kw):
+        state["inflight"] += 1
+        state["peak"] = max(state["peak"], state["inflight"])
+        await asyncio.sleep(0.02)
+        state["inflight"] -= 1
+        return _ok('{"report":"r","summary":[],"updated_files":[]}')
+    monkeypatch.setattr(m, "_http_post", fake_post)
+
+    async def main():
+        msgs = [[{"role": "user", "content": str(i)}] for i in range(50)]
+        return await asyncio.gather(*(m.call_llm_json("https://x/v1/chat/completions", "k", "mdl", ms) for ms in msgs))
+
+    out = asyncio.run(main())
+    assert len(out) == 50 and state["peak"] == 50
+
+def test_http_client_is_shared_per_loop():
+    async def grab():
+        return m._http_client(), m._http_client()
+    a, b = asyncio.run(grab())
+    assert a is b
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+import app.main as m
+from app.llmcache import LLMCache
+from .test_compare_endpoint import _FakeRepo
+
+class _CountingRepo(_FakeRepo):
+    def __init__(self, calls, name):
+        self.calls = calls
+        self.name = name
+    def get_contents(self, path, ref="main"):
+        self.calls.append((self.name, path))
+        return super().get_contents(path, ref)
+
+class _GH:
+    def __init__(self, calls):
+        self.calls = calls
+    def get_repo(self, name):
+        return _CountingRepo(self.calls, name)
+
+DEFAULTS = {"include_ext": [".py"], "include_paths": ["src/"], "requisitos": "sem duplicado", "debug_no_llm": True}
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(m, "gh_client", lambda body: _GH(calls))
+    monkeypatch.setattr(m, "blob_cache", None)
+    return calls
+
+def test_items_sharing_repo_and_filters_are_crawled_once(calls):
+    c = TestClient(m.app)
+    r = c.post("/compare/batch", json={"defaults": DEFAULTS, "items": [
+        {"repo": "org/a"},
+        {"repo": "org/a", "requisitos": "outro preset"},
+        {"repo": "org/b", "branch": "dev"},
+    ]})
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert j["crawls"] == 2
+    assert [(i["index"], i["repo"], i["status"]) for i in j["items"]] == [(0, "org/a", 200), (1, "org/a", 200), (2, "org/b", 200)]
+    assert all(i["result"]["packing"]["files"] == 1 for i in j["items"])
+    # org/a backs two items but was walked exactly as often as org/b
+    per_repo = {n: sum(1 for name, _ in calls if name == n) for n in ("org/a", "org/b")}
+    assert per_repo["org/a"] == per_repo["org/b"] > 0
+
+def test_identical_prompts_reach_the_provider_once(calls, monkeypatch):
+    monkeypatch.setattr(m, "llm_cache", LLMCache(3600, 1 << 20))
+    posted = []
+
+    class R:
+        status_code = 200
+        headers = {}
+        def raise_for_status(self): return None
+        def json(self):
+            return {"choices": [{"message": {"content": '{"report":"r","summary":["s"],"updated_files":[]}'}}]}
+
+    async def _post(url, **kw):
+        posted.append(url)
+        await asyncio.sleep(0.05)  # keep the first call in flight while the others arrive
+        return R()
+    monkeypatch.setattr(m, "_http_post", _post)
+    before = m.LLM_DEDUPED.value()
+    item = {"repo": "org/a", "debug_no_llm": False, "llm_api_key": "k"}
+    j = TestClient(m.app).post("/compare/batch", json={"defaults": DEFAULTS, "items": [item, item, item]}).json()
+    assert [i["result"]["report"] for i in j["items"]] == ["r", "r", "r"]
+    assert len(posted) == 1 and m.LLM_DEDUPED.value() - before == 2
+
+def test_failures_are_reported_per_item(calls, monkeypatch):
+    monkeypatch.setattr(m, "LOCAL_SOURCE_ROOTS", [])
+    j = TestClient(m.app).post("/compare/batch", json={"defaults": DEFAULTS, "items": [
+        {"repo": "org/a"}, {"repo": "org/a", "source": "local", "local_path": "/tmp"},
+    ]}).json()
+    assert [i["status"] for i in j["items"]] == [200, 400]
+    assert "LOCAL_SOURCE_ROOTS" in j["items"][1]["error"] and j["items"][1]["result"] is None
+
+def test_invalid_item_rejects_the_batch(calls):
+    r = TestClient(m.app).post("/compare/batch", json={"defaults": DEFAULTS, "items": [{"repo": "org/a"}, {"branch": "x"}]})
+    assert r.status_code == 422 and "Item 1" in r.json()["detail"]
@@ -0,0 +1,110 @@
+# Microbenchmarks for the server hot paths on synthetic inputs of realistic size.
+# Opt-in (pytest -m benchmark). Each also checks its result; timings only fail a run
+# when compared with --bench-baseline (see conftest.py).
+import os, sys, json, random, asyncio, subprocess
+import pytest
+import app.main as m
+from .test_extract_crawl import _FakeContent, _FakeRepo, _FakeGH
+
+pytestmark = pytest.mark.benchmark
+
+class _BigRepo(_FakeRepo):
+    # src/pkgNN/modNNN.py style tree served through the same get_contents() interface
+    def __init__(self, dirs=40, files_per_dir=50, lines=60):
+        rnd = random.Random(1)
+        self._tree = {"": []}
+        for d in range(dirs):
+            top = "src" if d % 4 else "vendor"
+            dpath = f"{top}/pkg{d:02d}"
+            if not any(c.path == top for c in self._tree[""]):
+                self._tree[""].append(_FakeContent(top, "dir"))
+                self._tree[top] = []
+            self._tree[top].append(_FakeContent(dpath, "dir"))
+            self._tree[dpath] = []
+            for i in range(files_per_dir):
+                ext = rnd.choice([".py", ".py", ".js", ".java", ".md"])
+                body = "".join(f"value_{j} = compute({j}, '{dpath}')  # line {j}\n" for j in range(lines))
+                self._tree[dpath].append(_FakeContent(f"{dpath}/mod{i:03d}{ext}", "file", body.encode()))
+
+    def get_contents(self, path, ref="main"):
+        return list(self._tree[path])
+
+class _BigGH(_FakeGH):
+    def __init__(self, repo):
+        self._repo = repo
+    def get_repo(self, name):
+        return self._repo
+
+def test_bench_extract_numbered_code(bench, monkeypatch):
+    monkeypatch.setattr(m, "blob_cache", None)
+    gh = _BigGH(_BigRepo())
+    code, nfiles, _ = bench("extract_numbered_code_2k_files", lambda: m.extract_numbered_code(
+        gh, "org/repo", "main", [".py", ".js"], ["src/"], 5_000, 50_000_000, crawl="contents",
+        token_budget=2_000_000,
+    ), repeat=3)
+    assert nfiles > 800 and code.startswith("### src/")
+
+def test_bench_path_filters_many_globs(bench):
+    rnd = random.Random(2)
+    paths = [f"{rnd.choice(['src', 'lib', 'vendor', 'app/core'])}/pkg{rnd.randint(0, 99)}/m{i}{rnd.choice(['.py', '.js', '.css'])}"
+             for i in range(20_000)]
+    exts = [".py", ".js"]
+    pats = [f"pkg{i}/**/*.py" for i in range(20)] + [f"src/pkg{i}/" for i in range(20)] + ["app/core/*"]
+
+    allowed = bench("file_allowed_20k_paths_41_globs", lambda: [m.file_allowed(p, exts, pats) for p in paths], repeat=3)
+    matcher = m.PathMatcher(exts, pats)
+    compiled = bench("path_matcher_20k_paths_41_globs", lambda: [matcher.allowed(p) for p in paths])
+    assert allowed == compiled and any(allowed)
+    bench("path_matches_any_20k_paths_41_globs", lambda: [m._path_matches_any(p, pats) for p in paths], repeat=3)
+
+def _noisy_llm_output(files=400, lines=120):
+    updated = [{"path": f"src/pkg/m{i}.py",
+                "content": "import os\n" + "".join(f"def f{j}(x):\n    return x + {j}  # \"quoted\" {{braces}}\n" for j in range(lines))}
+               for i in range(files)]
+    body = json.dumps({"report": "r" * 2000, "summary": ["s"] * 50, "updated_files": updated})
+    return "Claro! Segue a análise completa do código:\n```json\n" + body + "\n```\nQualquer dúvida, avise.", updated
+
+def test_bench_safe_json_multi_megabyte(bench):
+    raw, updated = _noisy_llm_output()
+    assert len(raw) > 2_000_000
+    j = bench("safe_json_noisy_2mb", lambda: m.safe_json(raw))
+    assert len(j["updated_files"]) == len(updated)
+
+def test_bench_sanitize_hundreds_of_files(bench):
+    _, updated = _noisy_llm_output(files=500, lines=40)
+    out = {"report": "r", "summary": ["s"], "updated_files": updated + [{"path": "src/x.py", "content": "placeholder"}]}
+    clean = bench("sanitize_500_files", lambda: m._sanitize_llm_output(out, allow_placeholders=False))
+    assert len(clean["updated_files"]) == 500
+
+def test_bench_syntax_check_hundreds_of_files(bench, monkeypatch):
+    _, updated = _noisy_llm_output(files=500, lines=40)
+    monkeypatch.setattr(m, "SYNTAX_PARALLEL_MIN_BYTES", 0)
+    bench("syntax_check_500_files_inline", lambda: m._check_syntax_inline(updated))
+    try:
+        checked = bench("syntax_check_500_files_pool", lambda: asyncio.run(m._check_syntax(updated)))
+    finally:
+        m._shutdown_syntax_pool()
+    assert all(f["valid"] for f in checked)
+
+_PEAK_RSS_SCRIPT = """
+import json, resource
+import app.main as m
+files = [(f"src/pkg{i // 50}/m{i}.py", "".join(f"value_{j} = compute({j}, {i})  # line {j}\\n" for j in range(1300)).encode())
+         for i in range(1000)]
+base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+code, _ = m.pack_numbered_files(files, None)
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"input_mb": sum(len(b) for _, b in files) / 2**20, "output_mb": len(code) / 2**20,
+                  "peak_delta_mb": (peak - base) / 1024}))
+"""
+
+@pytest.mark.skipif(sys.platform == "win32", reason="resource.getrusage is POSIX-only")
+def test_bench_pack_peak_rss_50mb(record_property):
+    # fresh interpreter: ru_maxrss is a process-wide high-water mark
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", _PEAK_RSS_SCRIPT], cwd=root, capture_output=True, text=True, check=True)
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    record_property("pack_peak_rss", r)
+    assert r["input_mb"] > 50
+    # the output buffer plus its final copy; the old builder peaked at ~5x the output
+    assert r["peak_delta_mb"] < 2.5 * r["output_mb"]
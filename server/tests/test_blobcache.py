@@ -0,0 +1,51 @@
+import os, time
+import app.main as m
+from app.blobcache import BlobCache, git_blob_sha
+from .test_extract_tree import _El, _TreeRepo, _GH
+
+def test_git_blob_sha_matches_git():
+    # `printf 'hello\n' | git hash-object --stdin`
+    assert git_blob_sha(b"hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
+
+def test_put_get_and_counters(tmp_path):
+    c = BlobCache(str(tmp_path), 1 << 20)
+    sha = git_blob_sha(b"print(1)\n")
+    assert c.get(sha) is None
+    assert c.put(sha, b"print(1)\n")
+    assert c.get(sha) == b"print(1)\n"
+    assert c.stats()["hits"] == 1 and c.stats()["misses"] == 1
+
+def test_rejects_bad_keys_and_mismatched_content(tmp_path):
+    c = BlobCache(str(tmp_path), 1 << 20)
+    assert not c.put("../../etc/passwd", b"x")
+    assert not c.put(git_blob_sha(b"a"), b"b")
+    assert c.get("not-a-sha") is None
+
+def test_evicts_least_recently_used(tmp_path):
+    c = BlobCache(str(tmp_path), 250)
+    blobs = [bytes([65 + i]) * 100 for i in range(3)]
+    shas = [git_blob_sha(b) for b in blobs]
+    c.put(shas[0], blobs[0])
+    c.put(shas[1], blobs[1])
+    past = time.time() - 100
+    os.utime(c._path(shas[1]), (past, past))
+    c.put(shas[2], blobs[2])
+    c.evict()
+    assert c.get(shas[1]) is None
+    assert c.get(shas[0]) == blobs[0] and c.get(shas[2]) == blobs[2]
+
+def test_tree_crawl_reuses_cached_blobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(m, "blob_cache", BlobCache(str(tmp_path), 1 << 20))
+    els = [_El("src/a.py", "blob", b"print(1)\n"), _El("src/b.py", "blob", b"x = 2\n")]
+    for e in els:
+        e.sha = git_blob_sha(e._data)
+    args = dict(include_ext=[".py"], include_paths=["/"], max_files=10, max_bytes=1_000_000, crawl="tree")
+
+    first = _TreeRepo(els)
+    code1 = m.extract_numbered_code(_GH(first), "org/repo", "main", **args)
+    second = _TreeRepo(els)
+    code2 = m.extract_numbered_code(_GH(second), "org/repo", "main", **args)
+
+    assert code1 == code2
+    assert len(first.blob_calls) == 2 and second.blob_calls == []
+    assert m.blob_cache.stats()["hits"] == 2
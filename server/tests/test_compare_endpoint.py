@@ -27,10 +27,11 @@ class _FakeGH:
 def _mk_client(monkeypatch, groq_mock=None):
     # monkeypatch GH client factory
     monkeypatch.setattr(m, "gh_client", lambda body: _FakeGH())
-    # monkeypatch requests.post used by _groq_chat
+    # monkeypatch the pooled HTTP post used by the provider calls
     if groq_mock:
-        import requests
-        monkeypatch.setattr(requests, "post", groq_mock)
+        async def _post(url, **kw):
+            return groq_mock(url, headers=kw.get("headers"), json=kw.get("json"), timeout=kw.get("timeout", 60))
+        monkeypatch.setattr(m, "_http_post", _post)
     return TestClient(m.app)
 
 def test_compare_debug_no_llm(monkeypatch):
@@ -48,7 +49,7 @@ def test_compare_debug_no_llm(monkeypatch):
     assert "report" in j and j["updated_files"] == []
 
 def test_compare_llm_ok(monkeypatch):
-    # emulate 2-pass: first returns minimal JSON, second returns corrected JSON
+    # emulate 2-pass: first answer is not JSON at all, the repair pass returns corrected JSON
     calls = {"n":0}
     def fake_post(url, headers=None, json=None, timeout=60):
         class R:
@@ -58,9 +59,9 @@ def test_compare_llm_ok(monkeypatch):
             def json(self): return self._content
         calls["n"] += 1
         if calls["n"] == 1:
-            content = {"choices":[{"message":{"content":'{"report":"r1","summary":[],"updated_files":[]}'}}]}
+            content = {"choices":[{"message":{"content":'desculpe, report r1 sem json'}}]}
         else:
-            content = {"choices":[{"message":{"content":'{"report":"r2","summary":["ok"],"updated_files":[{"path":"src/a.py","content":"print(42)"}]}'}}]}
+            content = {"choices":[{"message":{"content":'{"report":"r2","summary":["ok"],"updated_files":[{"path":"src/a.py","content":"import os\\nprint(42)"}]}'}}]}
         return R(content)
 
     c = _mk_client(monkeypatch, groq_mock=fake_post)
@@ -79,6 +80,27 @@ def test_compare_llm_ok(monkeypatch):
     assert j["summary"] == ["ok"]
     assert j["updated_files"] and j["updated_files"][0]["path"] == "src/a.py"
 
+def test_compare_valid_first_pass_skips_repair(monkeypatch):
+    calls = {"n":0}
+    def fake_post(url, headers=None, json=None, timeout=60):
+        class R:
+            def raise_for_status(self): return None
+            def json(self):
+                return {"choices":[{"message":{"content":'```json\n{"report":"r1","summary":["s"],"updated_files":[],}\n```'}}]}
+        calls["n"] += 1
+        return R()
+    c = _mk_client(monkeypatch, groq_mock=fake_post)
+    r = c.post("/compare", json={
+        "repo":"fromLELI/storycompare-with-LLM",
+        "include_ext":[".py"],
+        "include_paths":["src/"],
+        "requisitos":"um pass so",
+        "groq_api_key": "xxx",
+        "llm_cache": False,
+    })
+    assert r.status_code == 200
+    assert r.json()["report"] == "r1" and calls["n"] == 1
+
 def test_compare_llm_error_bubbles_502(monkeypatch):
     def fake_post(url, headers=None, json=None, timeout=60):
         class R:
@@ -0,0 +1,56 @@
+import json
+from .test_compare_endpoint import _mk_client
+
+def _events(text):
+    out = []
+    for block in text.strip().split("\n\n"):
+        lines = block.split("\n")
+        if lines[0].startswith(":"):
+            continue
+        ev = lines[0].split(": ", 1)[1]
+        data = json.loads(lines[1].split(": ", 1)[1])
+        out.append((ev, data))
+    return out
+
+BODY = {
+    "repo": "org/repo",
+    "branch": "main",
+    "include_ext": [".py"],
+    "include_paths": ["src/"],
+    "requisitos": "x",
+}
+
+def test_stream_debug_no_llm_emits_progress_stages_and_result(monkeypatch):
+    c = _mk_client(monkeypatch)
+    r = c.post("/compare/stream", json={**BODY, "debug_no_llm": True})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/event-stream")
+    evs = _events(r.text)
+    names = [e for e, _ in evs]
+    assert names[-1] == "result"
+    assert ("progress", {"files": 1, "bytes": 16}) in evs
+    stages = [d["stage"] for e, d in evs if e == "stage"]
+    assert stages[:3] == ["github_client", "crawl", "pack"]
+    assert evs[-1][1]["packing"]["files"] == 1
+
+def test_stream_emits_files_before_result(monkeypatch):
+    def fake_post(url, headers=None, json=None, timeout=60):
+        class R:
+            def raise_for_status(self): return None
+            def json(self):
+                return {"choices": [{"message": {"content": '{"report":"r","summary":["ok"],"updated_files":[{"path":"src/a.py","content":"import os\\nprint(42)"}]}'}}]}
+        return R()
+    c = _mk_client(monkeypatch, groq_mock=fake_post)
+    r = c.post("/compare/stream", json={**BODY, "groq_api_key": "xxx", "llm_cache": False})
+    evs = _events(r.text)
+    names = [e for e, _ in evs]
+    assert "file" in names and names.index("file") < names.index("result")
+    assert dict(evs)["file"]["path"] == "src/a.py"
+    assert evs[-1][1]["updated_files"][0]["path"] == "src/a.py"
+
+def test_stream_reports_errors_as_events(monkeypatch):
+    c = _mk_client(monkeypatch)
+    r = c.post("/compare/stream", json={**BODY, "include_ext": [".rb"], "debug_no_llm": True})
+    assert r.status_code == 200
+    ev, data = _events(r.text)[-1]
+    assert ev == "error" and data["status"] == 400
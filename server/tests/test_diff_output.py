@@ -0,0 +1,60 @@
+import json
+from fastapi.testclient import TestClient
+import app.main as m
+from app.blobcache import git_blob_sha
+from app.compression import choose_encoding
+from app.textdiff import unified_diff, apply_unified_diff
+from .test_compare_endpoint import _mk_client
+
+BODY = {"repo": "org/repo", "branch": "main", "include_ext": [".py"], "include_paths": ["src/"],
+        "requisitos": "x", "groq_api_key": "k", "llm_cache": False}
+
+def _llm(content):
+    answer = json.dumps({"report": "r", "summary": ["s"], "updated_files": [{"path": "src/a.py", "content": content}]})
+    def fake_post(url, headers=None, json=None, timeout=60):
+        class R:
+            def raise_for_status(self): return None
+            def json(self): return {"choices": [{"message": {"content": answer}}]}
+        return R()
+    return fake_post
+
+def test_small_change_in_big_file_gives_small_diff():
+    old = "".join(f"value_{i} = {i}\n" for i in range(50_000))
+    new = old.replace("value_25000 = 25000\n", "value_25000 = 0  # fixed\n")
+    d = unified_diff("big.py", old, new)
+    assert d.startswith("--- a/big.py\n+++ b/big.py\n@@ -24998,7 +24998,7 @@\n")
+    assert len(d) < 400 and apply_unified_diff(old, d) == new
+    assert unified_diff("big.py", old, old) == ""
+
+def test_new_file_and_missing_final_newline_round_trip():
+    d = unified_diff("n.py", None, "a\nb")
+    assert d.startswith("--- /dev/null\n+++ b/n.py\n@@ -0,0 +1,2 @@\n") and d.endswith("\\ No newline at end of file\n")
+    assert apply_unified_diff(None, d) == "a\nb"
+    assert apply_unified_diff("a\nb", unified_diff("n.py", "a\nb", "a\nb\n")) == "a\nb\n"
+
+def test_compare_diff_output(monkeypatch):
+    c = _mk_client(monkeypatch, groq_mock=_llm("import os\nprint(42)\n"))
+    j = c.post("/compare", json={**BODY, "output": "diff"}).json()
+    (f,) = j["updated_files"]
+    original = b"print('legacy')\n"
+    assert f["content"] == "" and f["base_blob_sha"] == git_blob_sha(original)
+    assert "-print('legacy')\n+import os\n+print(42)\n" in f["diff"]
+    assert apply_unified_diff(original.decode(), f["diff"]) == "import os\nprint(42)\n"
+    full = c.post("/compare", json=BODY).json()["updated_files"][0]
+    assert full["diff"] is None and full["content"] == "import os\nprint(42)\n"
+
+def test_responses_are_compressed_when_accepted(monkeypatch):
+    c = _mk_client(monkeypatch)
+    r = c.get("/openapi.json", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["content-encoding"] == "gzip" and r.headers["vary"] == "Accept-Encoding"
+    assert r.json()["paths"]  # transparently decoded
+    assert "content-encoding" not in c.get("/health", headers={"Accept-Encoding": "gzip"}).headers  # tiny body
+    assert "content-encoding" not in c.get("/openapi.json", headers={"Accept-Encoding": "identity"}).headers
+    with c.stream("POST", "/compare/stream", json={**BODY, "debug_no_llm": True}, headers={"Accept-Encoding": "gzip"}) as s:
+        assert "content-encoding" not in s.headers
+
+def test_accept_encoding_negotiation():
+    assert choose_encoding("gzip, deflate, br", ("zstd", "gzip")) == "gzip"
+    assert choose_encoding("zstd;q=0.9, gzip;q=0.5", ("zstd", "gzip")) == "zstd"
+    assert choose_encoding("gzip;q=0", ("gzip",)) is None
+    assert choose_encoding("*", ("zstd", "gzip")) == "zstd"
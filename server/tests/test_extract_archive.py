@@ -0,0 +1,108 @@
+import io, tarfile
+import app.main as m
+from .test_extract_tree import _El, _TreeRepo, _GH
+
+def _tarball(files):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+        d = tarfile.TarInfo("org-repo-abc123")
+        d.type = tarfile.DIRTYPE
+        tf.addfile(d)
+        for path, data in files:
+            ti = tarfile.TarInfo(f"org-repo-abc123/{path}")
+            ti.size = len(data)
+            tf.addfile(ti, io.BytesIO(data))
+    return buf.getvalue()
+
+class _Resp:
+    def __init__(self, data):
+        self.raw = io.BytesIO(data)
+        self.closed = False
+    def raise_for_status(self): return None
+    def __enter__(self): return self
+    def __exit__(self, *a):
+        self.closed = True
+
+class _ArchiveRepo(_TreeRepo):
+    def __init__(self, els, truncated=False):
+        super().__init__(els, truncated)
+        self.archive_calls = []
+    def get_archive_link(self, fmt, ref):
+        self.archive_calls.append((fmt, ref))
+        return "https://codeload.example/tarball"
+
+FILES = [
+    ("src/a.py", b"print(1)\n"),
+    ("src/b.js", b"console.log(2)\n"),
+    ("static/x.css", b"body{}"),
+    ("src/c.py", b"x = 3\n"),
+]
+
+def _patch_get(monkeypatch):
+    seen = {}
+    def fake_get(url, stream=False, timeout=None):
+        assert stream
+        seen["resp"] = _Resp(_tarball(FILES))
+        return seen["resp"]
+    monkeypatch.setattr(m.requests, "get", fake_get)
+    return seen
+
+def test_archive_crawl_filters_while_streaming(monkeypatch):
+    monkeypatch.setattr(m, "blob_cache", None)
+    _patch_get(monkeypatch)
+    repo = _ArchiveRepo([])
+    code, nfiles, nbytes = m.extract_numbered_code(
+        _GH(repo), "org/repo", "main",
+        include_ext=[".py", ".js"], include_paths=["src/"],
+        max_files=10, max_bytes=1_000_000, crawl="archive",
+    )
+    assert repo.archive_calls == [("tarball", "main")]
+    assert code.index("### src/a.py") < code.index("### src/b.js") < code.index("### src/c.py")
+    assert "static/x.css" not in code
+    assert nfiles == 3 and nbytes == 9 + 15 + 6
+    assert repo.blob_calls == []
+
+def test_archive_crawl_stops_at_limits(monkeypatch):
+    monkeypatch.setattr(m, "blob_cache", None)
+    seen = _patch_get(monkeypatch)
+    code, nfiles, _ = m.extract_numbered_code(
+        _GH(_ArchiveRepo([])), "org/repo", "main",
+        include_ext=[".py"], include_paths=["/"],
+        max_files=1, max_bytes=1_000_000, crawl="archive",
+    )
+    assert "### src/a.py" in code and "src/c.py" not in code
+    assert nfiles == 2
+    assert seen["resp"].closed
+
+def test_auto_streams_archive_when_tree_is_truncated(monkeypatch):
+    monkeypatch.setattr(m, "blob_cache", None)
+    _patch_get(monkeypatch)
+    repo = _ArchiveRepo([_El("src/a.py", "blob", b"print(1)\n")], truncated=True)
+    code, nfiles, _ = m.extract_numbered_code(
+        _GH(repo), "org/repo", "main",
+        include_ext=[".py"], include_paths=["/"],
+        max_files=10, max_bytes=1_000_000,
+    )
+    assert repo.archive_calls and nfiles == 2
+    assert repo.contents_calls <= 1  # only the ref probe
+
+def test_auto_prefers_archive_for_large_selections(monkeypatch):
+    monkeypatch.setattr(m, "blob_cache", None)
+    monkeypatch.setattr(m, "ARCHIVE_MIN_FILES", 2)
+    _patch_get(monkeypatch)
+    els = [_El(p, "blob", d) for p, d in FILES]
+    repo = _ArchiveRepo(els)
+    m.extract_numbered_code(
+        _GH(repo), "org/repo", "main",
+        include_ext=[".py", ".js"], include_paths=["/"],
+        max_files=10, max_bytes=1_000_000,
+    )
+    assert repo.archive_calls and repo.blob_calls == []
+
+    small = _ArchiveRepo(els)
+    m.extract_numbered_code(
+        _GH(small), "org/repo", "main",
+        include_ext=[".py"], include_paths=["src/a.py"],
+        max_files=10, max_bytes=1_000_000,
+    )
+    assert small.archive_calls == [] and len(small.blob_calls) == 1
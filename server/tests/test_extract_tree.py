@@ -0,0 +1,90 @@
+import base64, threading, time
+import pytest
+from app.main import extract_numbered_code
+
+class _El:
+    def __init__(self, path, typ, data=b""):
+        self.path = path
+        self.type = typ
+        self.sha = f"sha-{path}"
+        self.size = len(data)
+        self._data = data
+
+class _Tree:
+    def __init__(self, els, truncated=False):
+        self.tree = els
+        self.raw_data = {"truncated": truncated}
+
+class _Blob:
+    def __init__(self, data):
+        self.encoding = "base64"
+        self.content = base64.b64encode(data).decode()
+
+class _TreeRepo:
+    default_branch = "main"
+    def __init__(self, els, truncated=False):
+        self._els = els
+        self._truncated = truncated
+        self.blob_calls = []
+        self.contents_calls = 0
+        self._lock = threading.Lock()
+    def get_contents(self, path, ref="main"):
+        self.contents_calls += 1
+        return []
+    def get_git_tree(self, sha, recursive=False):
+        assert recursive
+        return _Tree(self._els, self._truncated)
+    def get_git_blob(self, sha):
+        el = next(e for e in self._els if e.sha == sha)
+        # finish out of order to prove output order does not depend on completion order
+        time.sleep(0.02 if el.path.endswith("a.py") else 0)
+        with self._lock:
+            self.blob_calls.append(sha)
+        return _Blob(el._data)
+
+class _GH:
+    def __init__(self, repo):
+        self._repo = repo
+    def get_repo(self, name):
+        return self._repo
+
+def _els():
+    return [
+        _El("src", "tree"),
+        _El("src/a.py", "blob", b"print(1)\n"),
+        _El("src/b.js", "blob", b"console.log(2)\n"),
+        _El("src/c.py", "blob", b"x = 3\n"),
+        _El("static/x.css", "blob", b"body{}"),
+    ]
+
+def test_tree_crawl_filters_and_keeps_order():
+    repo = _TreeRepo(_els())
+    code, nfiles, nbytes = extract_numbered_code(
+        _GH(repo), "org/repo", "main",
+        include_ext=[".py", ".js"], include_paths=["src/"],
+        max_files=10, max_bytes=1_000_000, crawl="tree", workers=4,
+    )
+    assert code.index("### src/a.py") < code.index("### src/b.js") < code.index("### src/c.py")
+    assert "1: print(1)" in code and "static/x.css" not in code
+    assert nfiles == 3 and nbytes == 9 + 15 + 6
+    assert "sha-static/x.css" not in repo.blob_calls
+
+def test_tree_crawl_limits_only_fetch_needed_blobs():
+    repo = _TreeRepo(_els())
+    code, nfiles, _ = extract_numbered_code(
+        _GH(repo), "org/repo", "main",
+        include_ext=[".py", ".js"], include_paths=["/"],
+        max_files=1, max_bytes=1_000_000, crawl="tree",
+    )
+    assert "### src/a.py" in code and "src/b.js" not in code
+    assert nfiles == 2  # same accounting as the directory walk: overflowing file is counted
+    assert len(repo.blob_calls) == 2
+
+def test_tree_mode_refuses_truncated_tree():
+    repo = _TreeRepo(_els(), truncated=True)
+    with pytest.raises(ValueError):
+        extract_numbered_code(
+            _GH(repo), "org/repo", "main",
+            include_ext=[".py"], include_paths=["/"],
+            max_files=10, max_bytes=1_000_000, crawl="tree",
+        )
@@ -0,0 +1,134 @@
+import json
+import pytest
+from github.GithubException import GithubException
+from github.Requester import Requester
+import app.main as m
+from app.ghmeta import ETagCache, ShaCache, SHA_MEDIA_TYPE
+
+class _Auth:
+    def __init__(self, token):
+        self.token = token
+
+class _Requester:
+    # serves GET urls from a dict and honours If-None-Match like GitHub does
+    createException = staticmethod(Requester.createException)
+
+    def __init__(self, routes, token="t1"):
+        self.routes = routes
+        self.auth = _Auth(token)
+        self.calls = []
+
+    def requestJson(self, verb, url, headers=None):
+        self.calls.append((url, dict(headers or {})))
+        if url not in self.routes:
+            return 404, {}, json.dumps({"message": "Not Found"})
+        body = self.routes[url]
+        etag = f'"{hash(body)}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, ""
+        return 200, {"ETag": etag}, body
+
+class _Repo:
+    def __init__(self, name):
+        self.name = name
+
+class _GH:
+    def __init__(self, requester):
+        self.requester = requester
+    def get_repo(self, name, lazy=False):
+        assert lazy
+        return _Repo(name)
+
+def test_etag_revalidation_returns_cached_body():
+    req = _Requester({"/x": "v1"})
+    cache = ETagCache()
+    assert cache.get(req, "/x") == "v1"
+    assert cache.get(req, "/x") == "v1"
+    assert "If-None-Match" in req.calls[1][1]
+    assert cache.stats() == {"entries": 1, "not_modified": 1, "fetched": 1}
+
+    req.routes["/x"] = "v2"  # resource changed upstream
+    assert cache.get(req, "/x") == "v2"
+
+def test_etags_are_per_credential():
+    cache = ETagCache()
+    cache.get(_Requester({"/x": "v1"}, token="a"), "/x")
+    other = _Requester({"/x": "v1"}, token="b")
+    cache.get(other, "/x")
+    assert "If-None-Match" not in other.calls[0][1]
+
+def test_etag_errors_raise_github_exception():
+    with pytest.raises(GithubException) as ei:
+        ETagCache().get(_Requester({}), "/missing")
+    assert ei.value.status == 404
+
+def test_sha_cache_is_bounded_lru():
+    c = ShaCache(max_entries=2)
+    c.put("a", 1); c.put("b", 2); c.get("a"); c.put("c", 3)
+    assert c.get("b") is None and c.get("a") == 1 and c.get("c") == 3
+
+def test_resolve_ref_to_sha_and_fallback(monkeypatch):
+    monkeypatch.setattr(m, "gh_etags", ETagCache())
+    req = _Requester({
+        "/repos/o/r": json.dumps({"default_branch": "trunk"}),
+        "/repos/o/r/commits/trunk": "abc123\n",
+        "/repos/o/r/commits/feature/x": "def456",
+    })
+    gh = _GH(req)
+    _, ref, sha = m._resolve_repo_ref(gh, "o/r", "feature/x")
+    assert (ref, sha) == ("feature/x", "def456")
+    assert req.calls[0][1]["Accept"] == SHA_MEDIA_TYPE
+
+    _, ref, sha = m._resolve_repo_ref(gh, "o/r", "gone")
+    assert (ref, sha) == ("trunk", "abc123")
+
+    _, ref, sha = m._resolve_repo_ref(gh, "o/r", None)
+    assert (ref, sha) == ("trunk", "abc123")
+
+def test_tree_listing_cached_by_commit_sha(monkeypatch):
+    monkeypatch.setattr(m, "tree_cache", ShaCache())
+    calls = []
+
+    class _Tree:
+        tree = []
+        raw_data = {"truncated": False}
+
+    class _R:
+        def get_git_tree(self, ref, recursive=False):
+            calls.append(ref)
+            return _Tree()
+
+    m._git_tree(_R(), "abc", ("o/r", "abc"))
+    m._git_tree(_R(), "abc", ("o/r", "abc"))
+    m._git_tree(_R(), "main", None)  # unresolved refs are never cached
+    m._git_tree(_R(), "main", None)
+    assert calls == ["abc", "main", "main"]
+
+def test_pinned_sha_is_authorized_and_trees_are_per_credential(monkeypatch):
+    from .test_extract_tree import _El, _TreeRepo
+    monkeypatch.setattr(m, "gh_etags", ETagCache())
+    monkeypatch.setattr(m, "tree_cache", ShaCache())
+    monkeypatch.setattr(m, "blob_cache", None)
+    sha = "a" * 40
+    repo = _TreeRepo([_El("src/a.py", "blob", b"secret = 1\n")])
+    trees = []
+    get_tree = repo.get_git_tree
+    repo.get_git_tree = lambda ref, recursive=False: trees.append(ref) or get_tree(ref, recursive)
+
+    class _G(_GH):
+        def get_repo(self, name, lazy=False):
+            return repo
+
+    owner = _Requester({f"/repos/o/r/commits/{sha}": sha}, token="owner")
+    files, _, _ = m.collect_source_files(_G(owner), "o/r", sha, [".py"], [], 10, 10_000, crawl="tree")
+    assert files and owner.calls[0][0] == f"/repos/o/r/commits/{sha}"
+
+    # a credential without access cannot ride on the owner's cached tree
+    outsider = _Requester({}, token="outsider")
+    with pytest.raises(GithubException):
+        m.collect_source_files(_G(outsider), "o/r", sha, [".py"], [], 10, 10_000, crawl="tree")
+
+    # another authorized credential fetches its own tree
+    other = _Requester({f"/repos/o/r/commits/{sha}": sha}, token="other")
+    m.collect_source_files(_G(other), "o/r", sha, [".py"], [], 10, 10_000, crawl="tree")
+    assert trees == [sha, sha]
@@ -0,0 +1,50 @@
+import threading, time
+import app.main as m
+from app.ghpool import GithubPool, TOKEN_REFRESH_MARGIN
+
+def _pool(expires_in=3600):
+    calls = []
+    def mint(app_id, inst_id, pem):
+        calls.append((app_id, inst_id))
+        time.sleep(0.05)  # let concurrent callers pile up on the refresh
+        return f"tok-{len(calls)}", time.time() + expires_in
+    return GithubPool(mint=mint), calls
+
+def test_pat_clients_are_reused_per_credential():
+    pool, _ = _pool()
+    assert pool.token("ghp_a") is pool.token("ghp_a")
+    assert pool.token("ghp_a") is not pool.token("ghp_b")
+    assert pool.token(None) is pool.token(None)
+
+def test_installation_token_single_flight():
+    pool, calls = _pool()
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(pool.app("1", "2", "pem"))) for _ in range(10)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    assert len(calls) == 1
+    assert all(c is out[0] for c in out)
+    assert pool._flights == {}  # flight locks do not outlive the refresh
+
+def test_token_refreshed_before_expiry():
+    pool, calls = _pool(expires_in=TOKEN_REFRESH_MARGIN - 1)
+    a = pool.app("1", "2", "pem")
+    b = pool.app("1", "2", "pem")
+    assert len(calls) == 2 and a is not b
+
+def test_pool_is_bounded():
+    pool = GithubPool(max_clients=2)
+    first = pool.token("a")
+    pool.token("b"); pool.token("c")
+    assert pool.stats()["clients"] == 2
+    assert pool.token("a") is not first
+
+def test_gh_client_decodes_pem_once(monkeypatch):
+    seen = []
+    monkeypatch.setattr(m, "gh_via_app", lambda a, i, pem: seen.append(pem) or object())
+    body = m.CompareIn(repo="o/r", requisitos="x", github_app_id="1", github_installation_id="2",
+                       github_private_key_pem_b64="LS0tLS1CRUdJTg==")
+    m._decode_pem_b64.cache_clear()
+    m.gh_client(body); m.gh_client(body)
+    assert seen == ["-----BEGIN", "-----BEGIN"]
+    assert m._decode_pem_b64.cache_info().hits == 1
@@ -0,0 +1,102 @@
+import pytest
+from fastapi.testclient import TestClient
+import app.main as m
+from .test_extract_tree import _El, _TreeRepo, _GH
+
+class _File:
+    def __init__(self, filename, status, previous_filename=None):
+        self.filename = filename
+        self.status = status
+        self.previous_filename = previous_filename
+
+class _Cmp:
+    def __init__(self, files, status="ahead"):
+        self.files = files
+        self.status = status
+
+class _DiffRepo(_TreeRepo):
+    def __init__(self, els, cmp):
+        super().__init__(els)
+        self._cmp = cmp
+        self.compared = []
+    def compare(self, base, head):
+        self.compared.append((base, head))
+        return self._cmp
+
+def _repo(status="ahead"):
+    els = [
+        _El("src/a.py", "blob", b"a = 1\n"),
+        _El("src/b.py", "blob", b"b = 2\n"),
+        _El("src/new.py", "blob", b"n = 3\n"),
+        _El("src/conf.py", "blob", b"DEBUG = False\n"),
+    ]
+    cmp = _Cmp([_File("src/b.py", "modified"), _File("src/new.py", "renamed", "src/old.py"), _File("src/c.py", "removed")], status)
+    return _DiffRepo(els, cmp)
+
+BODY = {"repo": "org/repo", "branch": "main", "include_ext": [".py"], "include_paths": ["src/"],
+        "requisitos": "x", "debug_no_llm": True}
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(m, "JOBS_DB", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(m, "blob_cache", None)
+    with TestClient(m.app) as c:
+        yield c
+
+def test_base_sha_reviews_only_changed_and_context_files(client, monkeypatch):
+    repo = _repo()
+    monkeypatch.setattr(m, "gh_client", lambda body: _GH(repo))
+    r = client.post("/compare", json={**BODY, "base_sha": "b" * 40, "context_paths": ["src/conf.py"]})
+    assert r.status_code == 200, r.text
+    j = r.json()
+    assert repo.compared == [("b" * 40, "main")]
+    assert j["packing"]["files"] == 3  # b.py, new.py + the context file; a.py is unchanged
+    assert j["incremental"]["changed"] == ["src/b.py", "src/new.py"]
+    assert j["incremental"]["removed"] == ["src/c.py", "src/old.py"]
+    assert not j["incremental"]["full"]
+
+def test_base_run_output_is_reused_for_unchanged_files(client, monkeypatch):
+    repo = _repo()
+    monkeypatch.setattr(m, "gh_client", lambda body: _GH(repo))
+    store = m.job_runner.store
+    base_id = store.create({**BODY, "debug_no_llm": False}, None)
+    store.finish(base_id, "done", result={
+        "report": "base report", "summary": ["s1"], "commit_sha": "c" * 40,
+        "updated_files": [{"path": p, "content": "x"} for p in ("src/a.py", "src/b.py", "src/c.py")],
+    })
+    j = client.post("/compare", json={**BODY, "base_run_id": base_id}).json()
+    assert repo.compared == [("c" * 40, "main")]
+    assert [f["path"] for f in j["updated_files"]] == ["src/a.py"]
+    assert j["incremental"]["reused"] == ["src/a.py"]
+    assert "s1" in j["summary"]
+
+def test_diverged_history_falls_back_to_full_review(client, monkeypatch):
+    repo = _repo(status="diverged")
+    monkeypatch.setattr(m, "gh_client", lambda body: _GH(repo))
+    j = client.post("/compare", json={**BODY, "base_sha": "b" * 40}).json()
+    assert j["incremental"]["full"] and j["packing"]["files"] == 4
+
+def test_unknown_or_foreign_base_run_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(m, "gh_client", lambda body: _GH(_repo()))
+    assert client.post("/compare", json={**BODY, "base_run_id": "nope"}).status_code == 404
+    store = m.job_runner.store
+    other = store.create({**BODY, "repo": "org/other"}, None)
+    store.finish(other, "done", result={"report": "", "summary": [], "updated_files": [], "commit_sha": "d" * 40})
+    assert client.post("/compare", json={**BODY, "base_run_id": other}).status_code == 400
+
+def test_base_run_with_other_review_parameters_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(m, "gh_client", lambda body: _GH(_repo()))
+    store = m.job_runner.store
+    base_id = store.create(m.CompareIn(**{**BODY, "requisitos": "outra coisa"}).model_dump(), None)
+    store.finish(base_id, "done", result={"report": "", "summary": [], "updated_files": [], "commit_sha": "c" * 40})
+    r = client.post("/compare", json={**BODY, "base_run_id": base_id})
+    assert r.status_code == 400 and "requisitos" in r.json()["detail"]
+
+def test_no_changes_skips_crawl_even_with_context_paths(client, monkeypatch):
+    repo = _repo()
+    repo._cmp = _Cmp([], status="identical")
+    monkeypatch.setattr(m, "gh_client", lambda body: _GH(repo))
+    j = client.post("/compare", json={**BODY, "debug_no_llm": False, "base_sha": "b" * 40,
+                                      "context_paths": ["src/conf.py"]}).json()
+    assert repo.blob_calls == []
+    assert j["updated_files"] == [] and j["report"].startswith("Nenhuma alteração")
@@ -0,0 +1,117 @@
+import asyncio, threading, time
+import pytest
+from fastapi.testclient import TestClient
+import app.main as m
+from app.jobs import JobRunner, JobStore
+from .test_compare_endpoint import _FakeGH
+
+BODY = {
+    "repo": "org/repo",
+    "branch": "main",
+    "include_ext": [".py"],
+    "include_paths": ["src/"],
+    "requisitos": "x",
+    "debug_no_llm": True,
+}
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(m, "JOBS_DB", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(m, "gh_client", lambda body: _FakeGH())
+    with TestClient(m.app) as c:
+        yield c
+
+def _wait(c, job_id, states=("done", "failed", "cancelled"), timeout=5.0):
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        j = c.get(f"/jobs/{job_id}").json()
+        if j["status"] in states:
+            return j
+        time.sleep(0.02)
+    raise AssertionError(f"job stuck: {j}")
+
+def test_job_runs_and_stores_result_and_stages(client):
+    r = client.post("/jobs", json=BODY)
+    assert r.status_code == 202 and r.json()["status"] == "queued"
+    j = _wait(client, r.json()["id"])
+    assert j["status"] == "done"
+    assert j["result"]["report"].startswith("[debug_no_llm]")
+    assert {"github_client", "crawl", "pack"} <= set(j["stages"])
+    assert j["progress"] == {"files": 1, "bytes": 16}
+
+def test_job_failure_is_recorded(client):
+    r = client.post("/jobs", json={**BODY, "include_ext": [".rb"]})
+    j = _wait(client, r.json()["id"])
+    assert j["status"] == "failed" and j["error_status"] == 400
+
+def test_cancel_running_job(client, monkeypatch):
+    async def slow(body, emit=None):
+        await asyncio.sleep(30)
+    monkeypatch.setattr(m, "_run_compare", slow)
+    job_id = client.post("/jobs", json=BODY).json()["id"]
+    _wait(client, job_id, states=("running",))
+    assert client.delete(f"/jobs/{job_id}").status_code == 200
+    assert _wait(client, job_id)["status"] == "cancelled"
+
+def test_unknown_job_404(client):
+    assert client.get("/jobs/nope").status_code == 404
+
+def test_secrets_are_not_persisted(tmp_path):
+    store = JobStore(str(tmp_path / "j.sqlite3"))
+    job_id = store.create({**BODY, "github_pat": "ghp_secret", "llm_api_key": "sk-live-secret"}, owner="w1")
+    raw = (tmp_path / "j.sqlite3").read_bytes() + (tmp_path / "j.sqlite3-wal").read_bytes()
+    assert b"ghp_secret" not in raw and b"sk-live-secret" not in raw
+    job = store.get(job_id)
+    assert job["pinned"] and "github_pat" not in job["request"]
+
+def test_claim_is_exclusive_and_respects_pinning(tmp_path):
+    store = JobStore(str(tmp_path / "j.sqlite3"))
+    pinned = store.create(BODY, owner="w1")
+    free = store.create(BODY, owner=None)
+    assert store.claim("w2")["id"] == free
+    assert store.claim("w2") is None
+    assert store.claim("w1")["id"] == pinned
+
+def test_dead_worker_jobs_are_requeued_or_failed(tmp_path):
+    store = JobStore(str(tmp_path / "j.sqlite3"))
+    free = store.create(BODY, owner=None)
+    pinned = store.create(BODY, owner="dead")
+    store.claim("dead"); store.claim("dead")
+    store.heartbeat("alive", stale_after=60)
+    assert store.get(free)["status"] == "queued"
+    assert store.get(pinned)["status"] == "failed"
+
+def test_cancel_survives_dead_worker(tmp_path):
+    store = JobStore(str(tmp_path / "j.sqlite3"))
+    job_id = store.create(BODY, owner=None)
+    store.claim("dead")
+    store.request_cancel(job_id)  # flagged while running; the worker dies before seeing it
+    store.heartbeat("alive", stale_after=60)
+    assert store.get(job_id)["status"] == "cancelled"
+    assert store.claim("alive") is None
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_stop_with_job_in_flight(tmp_path, threaded):
+    store = JobStore(str(tmp_path / "j.sqlite3"))
+    started = threading.Event()
+
+    async def run(request, emit):
+        started.set()
+        if threaded:
+            await asyncio.to_thread(time.sleep, 0.2)
+        await asyncio.sleep(30)
+
+    async def main():
+        runner = JobRunner(store, run, concurrency=1, poll_seconds=0.01)
+        await runner.start()
+        job_id = runner.submit(BODY)
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        await asyncio.wait_for(runner.stop(), 5)
+        return job_id
+
+    job_id = asyncio.run(main())
+    store.close()  # only after stop(): the job released its row on an open store
+    store = JobStore(str(tmp_path / "j.sqlite3"))
+    job = store.get(job_id)
+    assert job["status"] == "queued" and job["owner"] is None
@@ -0,0 +1,42 @@
+from app.jsonrepair import repair_json
+from app.main import review_problems, _local_review, safe_json
+
+def test_trailing_commas_and_fences():
+    assert repair_json('```json\n{"a": [1, 2,], "b": {"c": 3,},}\n```') == {"a": [1, 2], "b": {"c": 3}}
+
+def test_prose_around_object():
+    assert repair_json('Claro! Aqui está:\n{"report": "ok"}\nQualquer dúvida, avise.') == {"report": "ok"}
+
+def test_unclosed_containers():
+    assert repair_json('{"report": "r", "summary": ["a", "b"') == {"report": "r", "summary": ["a", "b"]}
+
+def test_string_cut_mid_content_is_dropped_not_closed():
+    raw = ('{"report": "r", "updated_files": [{"path": "b.py", "content": "x = 1"}, '
+           '{"path": "a.py", "content": "import os\\ndef f():\\n    return os.pa')
+    j = repair_json(raw)
+    assert j["updated_files"][0] == {"path": "b.py", "content": "x = 1"}
+    assert "content" not in j["updated_files"][1]
+    # the half-written file never reaches the user
+    assert _local_review(safe_json(raw), raw)["updated_files"] == [{"path": "b.py", "content": "x = 1"}]
+
+def test_truncated_after_key_falls_back_to_last_comma():
+    assert repair_json('{"report": "r", "summary": ["a", "b"], "updated_fi') == {"report": "r", "summary": ["a", "b"]}
+    assert repair_json('{"report": "r", "summary": tru') == {"report": "r"}
+
+def test_unfinished_fence_and_raw_newlines():
+    assert repair_json('```json\n{"report": "linha1\nlinha2"}') == {"report": "linha1\nlinha2"}
+
+def test_hopeless_input():
+    assert repair_json("sem json aqui") is None
+
+def test_review_problems():
+    assert review_problems({"report": "", "summary": [], "updated_files": []}) == []
+    assert review_problems(safe_json("lixo"))
+    probs = review_problems({"report": 1, "summary": "x", "updated_files": [{"path": "a"}]})
+    assert len(probs) == 3
+
+def test_local_review_coerces_and_repairs():
+    raw = '{"report": ["a", "b"], "summary": "s", "updated_files": [{"path": "a.py", "content": "x"}, "lixo"],'
+    out = _local_review(safe_json(raw), raw)
+    assert out == {"report": "a\nb", "summary": ["s"], "updated_files": [{"path": "a.py", "content": "x"}]}
+    assert _local_review(safe_json('{"erro": 1}'), '{"erro": 1}') is None
@@ -0,0 +1,36 @@
+import asyncio, time
+import app.main as m
+from app.llmcache import LLMCache, llm_cache_key
+
+def test_key_covers_model_params_and_messages():
+    msgs = [{"role": "user", "content": "x"}]
+    k = llm_cache_key("u", "m", {"temperature": 0.2}, msgs)
+    assert k == llm_cache_key("u", "m", {"temperature": 0.2}, [dict(msgs[0])])
+    assert k != llm_cache_key("u", "m2", {"temperature": 0.2}, msgs)
+    assert k != llm_cache_key("u", "m", {"temperature": 0.3}, msgs)
+    assert k != llm_cache_key("u2", "m", {"temperature": 0.2}, msgs)
+
+def test_ttl_and_size_eviction():
+    c = LLMCache(ttl=0.05, max_bytes=10)
+    c.put("a", "12345")
+    c.put("b", "67890")
+    assert c.get("a") == "12345"
+    c.put("c", "xxxxx")  # "b" is now the least recently used
+    assert c.get("b") is None and c.get("a") == "12345"
+    time.sleep(0.06)
+    assert c.get("a") is None
+    assert c.stats()["evictions"] == 1
+
+def test_call_llm_json_hits_cache_and_opt_out(monkeypatch):
+    monkeypatch.setattr(m, "llm_cache", LLMCache(ttl=60, max_bytes=1 << 20))
+    calls = {"n": 0}
+    async def fake_chat(api_url, api_key, model, messages, *, temperature=0.2, top_p=0.9):
+        calls["n"] += 1
+        return '{"report":"r","summary":[],"updated_files":[]}'
+    monkeypatch.setattr(m, "_openai_chat", fake_chat)
+    msgs = [{"role": "user", "content": "same"}]
+    j1, _ = asyncio.run(m.call_llm_json("https://x/v1/chat/completions", "k", "mdl", msgs))
+    j2, _ = asyncio.run(m.call_llm_json("https://x/v1/chat/completions", "other-key", "mdl", msgs))
+    assert j1 == j2 and calls["n"] == 1
+    asyncio.run(m.call_llm_json("https://x/v1/chat/completions", "k", "mdl", msgs, use_cache=False))
+    assert calls["n"] == 2
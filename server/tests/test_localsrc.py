@@ -0,0 +1,83 @@
+import os, subprocess
+import pytest
+from fastapi.testclient import TestClient
+import app.main as m
+from app.localsrc import MirrorCache, read_file, resolve_local_path
+
+BODY = {"repo": "org/repo", "branch": "main", "include_ext": [".py"], "include_paths": ["src/"],
+        "requisitos": "x", "debug_no_llm": True}
+
+def _write(root, files):
+    for rel, data in files.items():
+        p = root / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(data)
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(m, "JOBS_DB", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(m, "gh_client", lambda body: pytest.fail("GitHub must not be used"))
+    with TestClient(m.app) as c:
+        yield c
+
+def test_local_checkout_uses_filters_and_limits(client, monkeypatch, tmp_path):
+    root = tmp_path / "ws"
+    _write(root, {"src/a.py": b"a = 1\n", "src/pkg/b.py": b"b = 2\n", "src/c.js": b"c\n", "docs/d.py": b"d\n",
+                  "src/.git/x.py": b"no\n", "src/empty.py": b""})
+    (root / "src" / "link.py").symlink_to(tmp_path / "outside.py")
+    (tmp_path / "outside.py").write_bytes(b"secret = 1\n")
+    monkeypatch.setattr(m, "LOCAL_SOURCE_ROOTS", [str(tmp_path)])
+    j = client.post("/compare", json={**BODY, "source": "local", "local_path": str(root)}).json()
+    assert j["packing"]["files"] == 3 and j["commit_sha"] is None
+    j = client.post("/compare", json={**BODY, "source": "local", "local_path": str(root), "max_files": 1}).json()
+    assert j["packing"]["files"] == 1
+
+def test_local_path_must_be_below_a_configured_root(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(m, "LOCAL_SOURCE_ROOTS", [str(tmp_path / "ws")])
+    r = client.post("/compare", json={**BODY, "source": "local", "local_path": str(tmp_path / "ws" / ".." / "etc")})
+    assert r.status_code == 400 and "LOCAL_SOURCE_ROOTS" in r.json()["detail"]
+    monkeypatch.setattr(m, "LOCAL_SOURCE_ROOTS", [])
+    assert client.post("/compare", json={**BODY, "source": "local", "local_path": str(tmp_path)}).status_code == 400
+
+def test_resolve_and_read(tmp_path):
+    (tmp_path / "f").write_bytes(b"xyz")
+    (tmp_path / "e").write_bytes(b"")
+    assert read_file(str(tmp_path / "f")) == b"xyz" and read_file(str(tmp_path / "e")) == b""
+    with pytest.raises(ValueError):
+        resolve_local_path("/", [str(tmp_path)])
+
+def _git(cwd, *args):
+    subprocess.run(["git", "-c", "user.name=t", "-c", "user.email=t@t", *args], cwd=cwd, check=True, capture_output=True)
+
+def _commit(work, files, msg):
+    _write(work, files)
+    _git(work, "add", "-A")
+    _git(work, "commit", "-q", "-m", msg)
+    return subprocess.run(["git", "rev-parse", "HEAD"], cwd=work, capture_output=True, text=True).stdout.strip()
+
+def test_mirror_clones_once_fetches_incrementally_and_diffs(client, monkeypatch, tmp_path):
+    work = tmp_path / "remote" / "org" / "repo"
+    work.mkdir(parents=True)
+    _git(work, "init", "-q", "-b", "main")
+    first = _commit(work, {"src/a.py": b"a = 1\n", "src/b.py": b"b = 2\n"}, "one")
+    mirrors = MirrorCache(str(tmp_path / "mirrors"), f"file://{tmp_path}/remote/{{repo}}")
+    monkeypatch.setattr(m, "mirror_cache", mirrors)
+
+    j = client.post("/compare", json={**BODY, "source": "mirror"}).json()
+    assert j["commit_sha"] == first and j["packing"]["files"] == 2 and mirrors.clones == 1
+
+    second = _commit(work, {"src/b.py": b"b = 3\n", "src/c.py": b"c = 4\n"}, "two")
+    os.remove(work / "src" / "a.py")
+    third = _commit(work, {}, "three")
+    j = client.post("/compare", json={**BODY, "source": "mirror", "base_sha": first}).json()
+    assert j["commit_sha"] == third and mirrors.fetches == 1
+    assert j["incremental"]["changed"] == ["src/b.py", "src/c.py"] and j["incremental"]["removed"] == ["src/a.py"]
+    assert j["packing"]["files"] == 2
+
+    j = client.post("/compare", json={**BODY, "source": "mirror", "base_sha": third}).json()
+    assert j["packing"]["files"] == 0 and not j["incremental"]["full"]
+    assert second != third
+
+def test_mirror_rejects_odd_repo_names(tmp_path):
+    with pytest.raises(ValueError):
+        MirrorCache(str(tmp_path)).path_for("../etc")
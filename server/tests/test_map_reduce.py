@@ -0,0 +1,45 @@
+import asyncio
+import app.main as m
+
+CODE = "\n\n".join([
+    "### src/a.py\n1: print(1)\n2: ### not a header",
+    "### src/b.py\n" + "\n".join(f"{i}: x = {i}" for i in range(1, 60)),
+    "### src/c.py\n1: y = 1",
+])
+
+def test_split_keeps_file_boundaries():
+    files = m._split_numbered_files(CODE)
+    assert [f.split("\n", 1)[0] for f in files] == ["### src/a.py", "### src/b.py", "### src/c.py"]
+    assert "\n\n".join(files) == CODE
+
+def test_shards_respect_budget_and_never_split_files():
+    shards = m._shard_numbered_code(CODE, shard_tokens=60)
+    assert len(shards) == 3  # b.py alone is over budget and gets its own shard
+    assert "\n\n".join(shards) == CODE
+    assert m._shard_numbered_code(CODE, shard_tokens=100_000) == [CODE]
+
+def test_merge_dedupes_paths_and_summary():
+    merged = m._merge_reviews([
+        {"report": "r1", "summary": ["s", "t"], "updated_files": [{"path": "a.py", "content": "1"}]},
+        {"report": "", "summary": ["s"], "updated_files": [{"path": "a.py", "content": "2"}, {"path": "b.py", "content": "3"}]},
+    ])
+    assert merged["report"] == "r1"
+    assert merged["summary"] == ["s", "t"]
+    assert [f["path"] for f in merged["updated_files"]] == ["a.py", "b.py"]
+
+def test_map_reduce_reviews_shards_concurrently(monkeypatch):
+    state = {"inflight": 0, "peak": 0, "calls": 0}
+    async def fake_review(api_url, api_key, requisitos, codigo, prompt_base, model, *, use_cache=True):
+        state["calls"] += 1
+        state["inflight"] += 1
+        state["peak"] = max(state["peak"], state["inflight"])
+        await asyncio.sleep(0.01)
+        state["inflight"] -= 1
+        path = codigo.split("\n", 1)[0][4:]
+        return {"report": path, "summary": [], "updated_files": [{"path": path, "content": "z"}]}, "raw1", "raw2"
+    monkeypatch.setattr(m, "_review_once", fake_review)
+
+    out, raw1, _ = asyncio.run(m.llm_refactor_review("u", "k", "req", CODE, None, "mdl", shard_tokens=60, parallelism=2))
+    assert state["calls"] == 3 and state["peak"] == 2
+    assert [f["path"] for f in out["updated_files"]] == ["src/a.py", "src/b.py", "src/c.py"]
+    assert raw1.count("raw1") == 3
@@ -0,0 +1,56 @@
+from fastapi.testclient import TestClient
+import app.main as m
+from app.metrics import Registry
+from .test_compare_endpoint import _mk_client
+
+BODY = {"repo": "org/repo", "branch": "main", "include_ext": [".py"], "include_paths": ["src/"],
+        "requisitos": "x", "debug_no_llm": True}
+
+def test_registry_renders_prometheus_text():
+    reg = Registry()
+    c = reg.counter("x_total", "Things.", ["kind"])
+    h = reg.histogram("x_seconds", "Latency.", ["stage"], buckets=(0.1, 1.0))
+    c.inc(kind="a"); c.inc(2, kind="a")
+    h.observe(0.05, stage="s"); h.observe(0.5, stage="s"); h.observe(5, stage="s")
+    text = reg.render()
+    assert "# TYPE x_total counter" in text and 'x_total{kind="a"} 3.0' in text
+    assert 'x_seconds_bucket{stage="s",le="0.1"} 1.0' in text
+    assert 'x_seconds_bucket{stage="s",le="1.0"} 2.0' in text
+    assert 'x_seconds_bucket{stage="s",le="+Inf"} 3.0' in text
+    assert 'x_seconds_count{stage="s"} 3.0' in text and 'x_seconds_sum{stage="s"} 5.55' in text
+
+def test_metrics_endpoint_counts_compare_stages(monkeypatch):
+    monkeypatch.setattr(m, "blob_cache", None)
+    c = _mk_client(monkeypatch)
+    before = m.STAGE_SECONDS.count(stage="github_listing")
+    files = m.FILES_COLLECTED.value()
+    assert c.post("/compare", json=BODY).status_code == 200
+    r = c.get("/metrics")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain")
+    assert 'legacyexe_stage_seconds_count{stage="pack"}' in r.text
+    assert m.STAGE_SECONDS.count(stage="github_listing") == before + 1
+    assert m.FILES_COLLECTED.value() == files + 1
+    assert "legacyexe_prompt_tokens_bucket" in r.text
+
+def test_timings_echoed_only_with_debug_echo_raw(monkeypatch):
+    monkeypatch.setattr(m, "blob_cache", None)
+    c = _mk_client(monkeypatch)
+    assert c.post("/compare", json=BODY).json().get("timings") is None
+    t = c.post("/compare", json={**BODY, "debug_echo_raw": True}).json()["timings"]
+    assert {"github_listing", "github_blobs", "crawl", "pack"} <= set(t)
+    assert all(v >= 0 for v in t.values())
+
+def test_provider_errors_and_429_are_counted(monkeypatch):
+    def fake_post(url, headers=None, json=None, timeout=60):
+        class R:
+            status_code = 429
+            headers = {"Retry-After": "0"}
+            def raise_for_status(self): return None
+            def json(self): return {}
+        return R()
+    c = _mk_client(monkeypatch, groq_mock=fake_post)
+    label = "api.groq.com"
+    before = m.LLM_429.value(provider=label)
+    r = c.post("/compare", json={**BODY, "debug_no_llm": False, "groq_api_key": "k", "llm_cache": False})
+    assert r.status_code >= 400
+    assert m.LLM_429.value(provider=label) > before
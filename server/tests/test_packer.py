@@ -0,0 +1,58 @@
+import app.main as m
+
+def _file(path, n, width=10):
+    return path, "\n".join("x" * width for _ in range(n)).encode()
+
+def test_no_budget_keeps_everything_and_numbers_lines():
+    code, rep = m.pack_numbered_files([("a.py", b"print(1)\nprint(2)\n")], None)
+    assert code == "### a.py\n1: print(1)\n2: print(2)"
+    assert rep["dropped"] == [] and rep["truncated"] == []
+    assert rep["tokens"] >= m._estimate_tokens(code)
+
+def test_cost_estimate_matches_rendered_text():
+    files = [_file("src/a.py", 120), _file("src/b.py", 7)]
+    code, rep = m.pack_numbered_files(files, None)
+    assert abs(rep["tokens"] - m._estimate_tokens(code)) <= len(files)
+
+def test_knapsack_picks_the_fullest_subset():
+    # 10k budget: greedy-in-order would take the big file only; the two mid ones pack tighter
+    big = _file("big.py", 380, width=60)   # ~6.2k tokens
+    mid1 = _file("m1.py", 285, width=60)   # ~4.7k tokens
+    mid2 = _file("m2.py", 285, width=60)
+    code, rep = m.pack_numbered_files([big, mid1, mid2], 10_000)
+    assert rep["tokens"] <= 10_000
+    assert "### m1.py" in code and "### m2.py" in code
+    assert rep["dropped"] == [] and rep["truncated"][0]["path"] == "big.py"
+    assert code.index("### big.py") < code.index("### m1.py")  # original order kept
+
+def test_leftover_budget_truncates_instead_of_dropping():
+    code, rep = m.pack_numbered_files([_file("a.py", 50), _file("b.py", 2000)], 3_000)
+    assert rep["tokens"] <= 3_000
+    t = rep["truncated"][0]
+    assert t["path"] == "b.py" and 0 < t["kept_lines"] < 2000 and t["total_lines"] == 2000
+    assert f"\n{t['kept_lines']}: " in code and f"\n{t['kept_lines'] + 1}: " not in code
+
+def test_drops_when_nothing_useful_fits():
+    _, rep = m.pack_numbered_files([_file("a.py", 200), _file("huge.py", 5000, width=80)], 1_000)
+    assert rep["dropped"] == ["huge.py"]
+
+def test_max_file_tokens_caps_each_file():
+    _, rep = m.pack_numbered_files([_file("a.py", 3000)], None, max_file_tokens=1_000)
+    assert rep["tokens"] <= 1_000 and rep["truncated"][0]["kept_lines"] < 3000
+
+def test_budget_for_model(monkeypatch):
+    monkeypatch.delenv("LLM_TOKEN_BUDGET", raising=False)
+    assert m.token_budget_for("llama-3.1-8b-instant") == 65_536
+    assert m.token_budget_for("unknown") == m.DEFAULT_CONTEXT_TOKENS // 2
+    monkeypatch.setenv("LLM_TOKEN_BUDGET", "1234")
+    assert m.token_budget_for("gemini-1.5-flash") == 1234
+
+def test_memory_ceiling_caps_unbudgeted_output(monkeypatch):
+    monkeypatch.setattr(m, "NUMBERED_MAX_TOKENS", 2_000)
+    code, rep = m.pack_numbered_files([_file("a.py", 300), _file("b.py", 3000)], None)
+    assert len(code) <= 2_000 * m.CHARS_PER_TOKEN
+    assert rep["token_budget"] is None and rep["truncated"][0]["path"] == "b.py"
+
+def test_line_separators_and_empty_files_render_like_splitlines():
+    code, _ = m.pack_numbered_files([("a.py", b"x\r\ny\rz\n"), ("e.py", b""), ("b.py", b"\xff\nq")], None)
+    assert code == "### a.py\n1: x\n2: y\n3: z\n\n### e.py\n\n\n### b.py\n1: \n2: q"
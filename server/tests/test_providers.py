@@ -0,0 +1,107 @@
+import asyncio, time
+import httpx
+from fastapi.testclient import TestClient
+import app.main as m
+from app.providers import Provider, ProviderPool, MIN_SAMPLES
+
+A = Provider("https://a/v1/chat/completions", "ka", "ma")
+B = Provider("https://b/v1/chat/completions", "kb", "mb")
+
+def _status_error(code):
+    req = httpx.Request("POST", "https://x")
+    return httpx.HTTPStatusError("boom", request=req, response=httpx.Response(code, request=req))
+
+def _pool(**kw):
+    return ProviderPool([A, B], **kw)
+
+def _run(pool, call, accept=None):
+    return asyncio.run(pool.run(pool.route(A), call, accept))
+
+def test_slow_primary_is_hedged_after_threshold():
+    pool = _pool(default_hedge_seconds=0.05)
+    started = {}
+    async def call(p):
+        started[p.model] = time.perf_counter()
+        await asyncio.sleep(1.0 if p is A else 0.01)
+        return p.model
+    t0 = time.perf_counter()
+    text, p = _run(pool, call)
+    assert (text, p) == ("mb", B)
+    assert 0.04 <= started["mb"] - started["ma"] < 0.5
+    assert time.perf_counter() - t0 < 0.5
+    assert pool.stats()[A.name]["hedges"] == 1 and pool.stats()[B.name]["wins"] == 1
+
+def test_hedge_threshold_follows_rolling_p95():
+    pool = _pool(default_hedge_seconds=10)
+    st = pool.stats_for(A)
+    st.latencies.extend([0.01] * MIN_SAMPLES)
+    assert pool.hedge_delay(A) == 0.01
+    assert pool.hedge_delay(B) == 10  # not enough samples yet
+
+def test_fast_primary_sends_no_hedge():
+    pool = _pool(default_hedge_seconds=0.2)
+    calls = []
+    async def call(p):
+        calls.append(p)
+        return "ok"
+    assert _run(pool, call) == ("ok", A)
+    assert calls == [A]
+
+def test_failover_on_5xx_and_timeout():
+    for exc in (_status_error(503), httpx.ReadTimeout("slow")):
+        pool = _pool()
+        async def call(p, exc=exc):
+            if p is A:
+                raise exc
+            return "from-b"
+        assert _run(pool, call) == ("from-b", B)
+        assert pool.stats()[A.name]["errors"] == 1
+
+def test_client_errors_do_not_fail_over():
+    pool = _pool()
+    calls = []
+    async def call(p):
+        calls.append(p)
+        raise _status_error(401)
+    try:
+        _run(pool, call)
+    except httpx.HTTPStatusError as e:
+        assert e.response.status_code == 401
+    else:
+        raise AssertionError("expected 401")
+    assert calls == [A]
+
+def test_rejected_answer_waits_for_hedge_then_falls_back():
+    pool = _pool(default_hedge_seconds=0.02)
+    async def call(p):
+        await asyncio.sleep(0.05 if p is A else 0.1)
+        return "not json" if p is A else '{"ok": 1}'
+    accept = lambda t: t.startswith("{")
+    assert _run(pool, call, accept) == ('{"ok": 1}', B)
+
+    async def bad(p):
+        await asyncio.sleep(0.05 if p is A else 0.1)
+        return f"bad-{p.model}"
+    assert _run(_pool(default_hedge_seconds=0.02), bad, accept) == ("bad-ma", A)
+
+def test_hedged_answer_is_not_cached_under_primary(monkeypatch):
+    monkeypatch.setattr(m, "llm_pool", ProviderPool([B]))
+    cache = m.LLMCache(60, 1 << 20)
+    monkeypatch.setattr(m, "llm_cache", cache)
+    async def call(p, messages, **kw):
+        if p.url == A.url:
+            raise _status_error(502)
+        return '{"report":"b"}'
+    monkeypatch.setattr(m, "_call_provider", call)
+    msgs = [{"role": "user", "content": "x"}]
+    out = asyncio.run(m._call_llm_text(A.url, A.key, A.model, msgs))
+    assert out == '{"report":"b"}' and cache.stats()["entries"] == 0
+
+def test_llm_providers_endpoint_hides_keys(monkeypatch):
+    pool = ProviderPool([B])
+    pool.stats_for(B).latencies.append(0.5)
+    monkeypatch.setattr(m, "llm_pool", pool)
+    j = TestClient(m.app).get("/llm/providers").json()
+    assert j["pool"] == [{"url": B.url, "model": "mb", "weight": 1.0}]
+    assert j["stats"][B.name]["p50"] == 0.5
+    assert "kb" not in str(j)
@@ -0,0 +1,77 @@
+import asyncio, time
+import app.main as m
+from app.ratelimit import ProviderLimiter, RateLimiters, parse_reset
+from .test_async_llm import _R, _ok
+
+URL = "https://x/v1/chat/completions"
+
+def test_parse_reset_formats():
+    assert parse_reset("1s") == 1.0
+    assert parse_reset("2m59.5s") == 179.5
+    assert parse_reset("120ms") == 0.12
+    assert parse_reset("7") == 7.0
+    assert parse_reset(None) is None and parse_reset("soon") is None
+
+def test_limits_are_learned_from_headers():
+    async def main():
+        lim = ProviderLimiter()
+        lim.observe({"X-RateLimit-Limit-Requests": "600", "x-ratelimit-remaining-requests": "0",
+                     "x-ratelimit-reset-requests": "80ms", "x-ratelimit-limit-tokens": "6000",
+                     "x-ratelimit-remaining-tokens": "5000"})
+        assert lim.requests.capacity == 600 and lim.tokens.capacity == 6000
+        t0 = time.monotonic()
+        await lim.acquire(10)
+        return time.monotonic() - t0
+    assert asyncio.run(main()) >= 0.07
+
+def test_token_budget_paces_calls_and_settles_usage():
+    async def main():
+        lim = ProviderLimiter(tpm=6000)  # 100 tokens/s
+        await lim.acquire(6000)
+        lim.settle(6000, 5990)  # the provider counted less: 10 tokens come back
+        t0 = time.monotonic()
+        await lim.acquire(15)  # 10 available, 5 more refill in ~0.05s
+        return time.monotonic() - t0
+    assert 0.03 <= asyncio.run(main()) < 0.5
+
+def test_429_backs_off_every_caller_once(monkeypatch):
+    monkeypatch.setattr(m, "llm_limits", RateLimiters())
+    monkeypatch.setattr(m, "llm_cache", None)
+    calls = []
+    async def fake_post(url, **kw):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return _R(429, headers={"Retry-After": "0.1"})
+        return _ok("ok")
+    monkeypatch.setattr(m, "_http_post", fake_post)
+
+    async def one(i):
+        await asyncio.sleep(0.01 * i)  # arrive after the first caller got throttled
+        return await m._openai_chat(URL, "k", "mdl", [{"role": "user", "content": str(i)}])
+
+    async def main():
+        return await asyncio.gather(*(one(i) for i in range(1, 6)))
+
+    assert asyncio.run(main()) == ["ok"] * 5
+    assert len(calls) == 6  # one 429, then each caller exactly once: no retry storm
+    assert all(t - calls[0] >= 0.09 for t in calls[1:])
+
+def test_waiters_are_served_in_arrival_order():
+    async def main():
+        lim = ProviderLimiter(rpm=1200)  # one request every 50ms after the first burst
+        lim.requests.level = 0
+        order = []
+        async def one(i):
+            await asyncio.sleep(0.001 * i)
+            await lim.acquire(1)
+            order.append(i)
+        await asyncio.gather(*(one(i) for i in range(5)))
+        return order
+    assert asyncio.run(main()) == [0, 1, 2, 3, 4]
+
+def test_limiters_are_per_key():
+    async def main():
+        reg = RateLimiters()
+        return reg.get(URL, "a"), reg.get(URL, "a"), reg.get(URL, "b")
+    a1, a2, b = asyncio.run(main())
+    assert a1 is a2 and a1 is not b
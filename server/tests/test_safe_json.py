@@ -1,3 +1,5 @@
+import json, time
+import pytest
 from app.main import safe_json
 
 def test_safe_json_plain_ok():
@@ -11,3 +13,45 @@ def test_safe_json_fenced_extraction():
 def test_safe_json_broken_returns_stub():
     j = safe_json("nonsense")
     assert "report" in j and "updated_files" in j
+
+def test_safe_json_prose_around_bare_json():
+    j = safe_json('Claro! Segue o resultado {ver abaixo}:\n{"report": "ok", "summary": [], "updated_files": []}\nQualquer dúvida, avise.')
+    assert j["report"] == "ok" and "_raw" not in j
+
+def test_safe_json_backticks_and_braces_inside_strings():
+    j = safe_json('```json\n{"report": "use ```x``` e {", "summary": ["}"], "updated_files": []}\n```')
+    assert j["report"] == "use ```x``` e {" and j["summary"] == ["}"]
+
+def test_safe_json_largest_object_wins():
+    j = safe_json('exemplo: {"a": 1} resposta: {"report": "r", "summary": ["s"], "updated_files": []} fim {"b": 2}')
+    assert j["report"] == "r"
+
+def test_safe_json_truncated_object_is_not_replaced_by_an_inner_one():
+    j = safe_json('{"report": "r", "updated_files": [{"path": "a.py", "content": "x"}')
+    assert "_raw" in j
+
+def _fast(text, limit=2.0):
+    t0 = time.perf_counter()
+    j = safe_json(text)
+    assert time.perf_counter() - t0 < limit
+    return j
+
+@pytest.mark.parametrize("text", [
+    "`" * 1_000_000,
+    "{" * 1_000_000,
+    '{"' * 500_000,
+    '"' * 1_000_000,
+    "\\" * 1_000_000,
+    '{"a": "' + "\\" * 1_000_000,
+    "[" * 200_000,
+    '{"a":' + "[" * 200_000,
+    "```json\n" * 100_000,
+    '{"a": 1]' * 100_000,
+])
+def test_safe_json_adversarial_inputs_stay_linear(text):
+    assert "_raw" in _fast(text)
+
+def test_safe_json_large_answer_with_many_backticks():
+    body = json.dumps({"report": "`" * 2_000_000, "summary": [], "updated_files": []})
+    j = _fast("```json\n" + body + "\n``` e mais ``` prosa ```")
+    assert len(j["report"]) == 2_000_000
@@ -0,0 +1,82 @@
+import json, asyncio, time
+import pytest
+import app.main as m
+from app.syntaxcheck import check_file, check_files, batches, looks_like_placeholder
+from .test_compare_endpoint import _mk_client
+
+def test_python_uses_the_real_parser():
+    assert check_file("cfg.py", "TIMEOUT = 30\nNAMES = ['a', 'b']\n") == (True, None)  # no def/class/import
+    valid, err = check_file("a.py", "def f(:\n    pass\n")
+    assert valid is False and err["line"] == 1 and err["col"] > 0 and err["message"]
+    assert check_file("a.py", "x = '\\d'\n") == (True, None)  # SyntaxWarning is not an error
+
+def test_java_brackets_skip_strings_chars_comments_and_text_blocks():
+    src = 'class A {\n  String s = "}";\n  char c = \'{\';\n  /* } */ // }\n  String t = """\n  }\n  """;\n}\n'
+    assert check_file("A.java", src) == (True, None)
+    valid, err = check_file("A.java", "class A {\n  void f() ) }\n")
+    assert valid is False and (err["line"], err["col"]) == (2, 12)
+    _, err = check_file("A.java", "class A {\n  void f() {\n}\n")
+    assert (err["line"], err["col"], err["message"]) == (1, 9, "'{' não fechado")
+    _, err = check_file("A.java", 'class A { String s = "abc;\n}')
+    assert err["message"] == "string não terminada"
+
+def test_js_templates_and_regex_literals():
+    src = "const r = /[/}]+/g;\nconst t = `a ${ {x: 1}.x } ${`in${1}`} }`;\nconst d = a / b / c;\nf({});\n"
+    assert check_file("a.js", src) == (True, None)
+    _, err = check_file("a.mjs", "const t = `a ${x`;\n")
+    assert err is not None
+    _, err = check_file("a.js", "function f() {\n  return [1, 2;\n}\n")
+    assert err["line"] == 3 and err["message"] == "esperado ']' (aberto na linha 2), encontrado '}'"
+
+def test_other_languages_are_not_checked():
+    assert check_file("README.md", "{ ( [") == (None, None)
+
+def test_placeholder_scanner_is_case_insensitive():
+    assert looks_like_placeholder("# CONTEÚDO DO ARQUIVO aqui")
+    assert looks_like_placeholder("Resultado disponível em breve")
+    assert looks_like_placeholder("   x  ")
+    assert not looks_like_placeholder("print('tudo certo')\n")
+
+def test_batches_keep_order_and_cover_everything():
+    items = [(f"f{i}.py", "x = 1\n" * (i + 1)) for i in range(30)]
+    parts = batches(items, 4)
+    assert 1 < len(parts) <= 5 and [it for b in parts for it in b] == items
+
+def test_process_pool_matches_inline(monkeypatch):
+    files = [{"path": f"src/m{i}.py", "content": "def f(x):\n    return x\n" * 200 + ("def (" if i % 7 == 0 else "")}
+             for i in range(40)] + [{"path": "src/B.java", "content": "class B {"}, {"path": "n.md", "content": "#"}]
+    monkeypatch.setattr(m, "SYNTAX_WORKERS", 2)
+    monkeypatch.setattr(m, "SYNTAX_PARALLEL_MIN_BYTES", 0)
+    try:
+        pooled = asyncio.run(m._check_syntax(files))
+        assert m._syntax_pool is not None
+    finally:
+        m._shutdown_syntax_pool()
+    assert pooled == m._check_syntax_inline(files)
+    assert [f["valid"] for f in pooled[:8]] == [False] + [True] * 6 + [False]
+    assert pooled[-2]["valid"] is False and pooled[-1]["valid"] is None
+
+def test_compare_reports_validity_and_keeps_plain_modules(monkeypatch):
+    answer = json.dumps({"report": "r", "summary": ["s"], "updated_files": [
+        {"path": "src/settings.py", "content": "DEBUG = False\nPORT = 8080\n"},
+        {"path": "src/a.py", "content": "def f(:\n    return 1\n"},
+    ]})
+    def fake_post(url, headers=None, json=None, timeout=60):
+        class R:
+            def raise_for_status(self): return None
+            def json(self): return {"choices": [{"message": {"content": answer}}]}
+        return R()
+    c = _mk_client(monkeypatch, fake_post)
+    r = c.post("/compare", json={"repo": "org/repo", "branch": "main", "include_ext": [".py"], "include_paths": ["src/"],
+                                 "requisitos": "x", "groq_api_key": "k", "llm_cache": False})
+    assert r.status_code == 200
+    files = {f["path"]: f for f in r.json()["updated_files"]}
+    assert files["src/settings.py"]["valid"] is True and files["src/settings.py"]["syntax_error"] is None
+    assert files["src/a.py"]["valid"] is False and files["src/a.py"]["syntax_error"]["line"] == 1
+
+@pytest.mark.parametrize("src", ["{" * 200_000, "/*" * 200_000, '"' * 400_000, "`${" * 100_000, "/" * 400_000],
+                         ids=["braces", "comments", "quotes", "templates", "slashes"])
+def test_clike_checker_stays_linear(src):
+    t0 = time.perf_counter()
+    check_files([("a.js", src), ("A.java", src)])
+    assert time.perf_counter() - t0 < 2.0